@@ -0,0 +1,278 @@
+"""
+Synthetic HAR generator and benchmark for the HAR -> k6 pipeline.
+
+    python benchmark.py --entries=5000 --body-size=20000 --token-density=5 --output=bench.json
+
+Each stage (HAR load, snapshot reload, combine, domain filter, correlation analysis, k6 generation,
+mock route lookup, and the fused single-read pipeline) is timed on a generated recording and the results are written
+as JSON so runs from different versions can be compared.
+"""
+import argparse
+import base64
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import string
+import subprocess
+import tempfile
+import time
+
+import occurance_fixed_15 as pipeline
+from har_stream import iter_har_entries, write_har
+from mock_routes import map_domain_ports, build_mock_routes, local_route
+
+DEFAULT_MIME_MIX = {
+    'application/json': 0.4,
+    'text/html': 0.25,
+    'application/javascript': 0.15,
+    'image/png': 0.1,
+    'text/plain': 0.1
+}
+TOKEN_ALPHABET = string.ascii_letters + string.digits
+FILLER_WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'checkout', 'cart', 'price', 'total', 'item']
+
+
+def random_token(rnd, length=16):
+    return ''.join(rnd.choices(TOKEN_ALPHABET, k=length))
+
+def filler_text(rnd, size):
+    words = []
+    length = 0
+    while length < size:
+        word = rnd.choice(FILLER_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+def synthetic_body(rnd, mime_type, body_size, token_density, session_tokens):
+    # token_density is the number of key=value tokens per 1000 body characters
+    token_count = max(1, int(body_size * token_density / 1000))
+    tokens = [(f"field{rnd.randrange(50)}", rnd.choice(session_tokens)) for _ in range(token_count)]
+
+    if mime_type == 'application/json':
+        document = {key: value for key, value in tokens}
+        document['items'] = [filler_text(rnd, 80) for _ in range(max(1, body_size // 90))]
+        return json.dumps(document), None
+    if mime_type.startswith('image/'):
+        return base64.b64encode(rnd.randbytes(body_size * 3 // 4)).decode('ascii'), 'base64'
+    if mime_type == 'application/javascript':
+        code = ''.join(f"var {rnd.choice(FILLER_WORDS)}{i}={rnd.randrange(1000)};" for i in range(max(1, body_size // 16)))
+        return code, None
+
+    # text/html and text/plain: filler text with key=value tokens spread through it
+    chunk_size = max(1, body_size // (token_count + 1))
+    parts = []
+    for key, value in tokens:
+        parts.append(filler_text(rnd, chunk_size))
+        parts.append(f"{key}={value}")
+    parts.append(filler_text(rnd, chunk_size))
+    return ' '.join(parts), None
+
+def synthetic_entries(entries, body_size, token_density, mime_mix, domains, seed):
+    rnd = random.Random(seed)
+    mime_types = list(mime_mix)
+    weights = [mime_mix[mime_type] for mime_type in mime_types]
+    hosts = [f"app{d}.bench.example" for d in range(domains)]
+    # A small pool of session values that keep reappearing, as real dynamic values do
+    session_tokens = [random_token(rnd) for _ in range(max(4, entries // 20))]
+
+    for i in range(entries):
+        host = rnd.choice(hosts)
+        session_token = rnd.choice(session_tokens)
+        mime_type = rnd.choices(mime_types, weights)[0]
+        body, encoding = synthetic_body(rnd, mime_type, body_size, token_density, session_tokens)
+        method = 'POST' if i % 4 == 0 else 'GET'
+
+        request = {
+            'method': method,
+            'url': f"https://{host}/api/v1/resource{i % 97}?sid={session_token}&page={i}",
+            'httpVersion': 'HTTP/1.1',
+            'headers': [
+                {'name': 'Accept', 'value': '*/*'},
+                {'name': 'User-Agent', 'value': 'Mozilla/5.0 (benchmark)'},
+                {'name': 'Cookie', 'value': f"sid={session_token}; lang=en"}
+            ],
+            'queryString': [],
+            'cookies': [],
+            'headersSize': -1,
+            'bodySize': 0
+        }
+        if method == 'POST':
+            request['postData'] = {
+                'mimeType': 'application/x-www-form-urlencoded',
+                'text': f"user=bench{i % 7}&csrf={rnd.choice(session_tokens)}&step={i}"
+            }
+
+        content = {'size': len(body), 'mimeType': mime_type, 'text': body}
+        if encoding:
+            content['encoding'] = encoding
+        yield {
+            'startedDateTime': '2024-01-01T00:00:00.000Z',
+            'time': 10,
+            'request': request,
+            'response': {
+                'status': rnd.choice([200, 200, 200, 201, 302]),
+                'statusText': '',
+                'httpVersion': 'HTTP/1.1',
+                'headers': [
+                    {'name': 'Content-Type', 'value': mime_type},
+                    {'name': 'Set-Cookie', 'value': f"sid={session_token}; Path=/; HttpOnly"}
+                ],
+                'cookies': [],
+                'content': content,
+                'redirectURL': '',
+                'headersSize': -1,
+                'bodySize': len(body)
+            },
+            'cache': {},
+            'timings': {'send': 1, 'wait': 8, 'receive': 1}
+        }
+
+def generate_synthetic_har(har_file_path, entries=1000, body_size=2000, token_density=5.0, mime_mix=None, domains=5, seed=0):
+    """
+    Write a synthetic HAR with the given shape and return the number of entries written.
+    """
+    return write_har(
+        synthetic_entries(entries, body_size, token_density, mime_mix or DEFAULT_MIME_MIX, domains, seed),
+        har_file_path,
+        {'version': '1.2', 'creator': {'name': 'benchmark.py', 'version': '1'}}
+    )
+
+def cpu_seconds():
+    # Includes finished child processes, so process-pool analysis is counted too
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def time_stage(func):
+    wall_start = time.perf_counter()
+    cpu_start = cpu_seconds()
+    # The pipeline prints progress and correlated rows; keep that out of the measurement output
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        func()
+    return time.perf_counter() - wall_start, cpu_seconds() - cpu_start
+
+def lookup_mock_routes(har_file_path):
+    domain_port_mapping = map_domain_ports(iter_har_entries(har_file_path))
+    mock_data = build_mock_routes(iter_har_entries(har_file_path), domain_port_mapping)
+    hits = 0
+    for entry in iter_har_entries(har_file_path):
+        route = (local_route(entry['request']['url'], domain_port_mapping), entry['request']['method'])
+        if mock_data.get(route) is not None:
+            hits += 1
+    return hits
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(entries=1000, body_size=2000, token_density=5.0, mime_mix=None, domains=5, seed=0,
+                  repeat=1, processes=None, work_dir=None):
+    """
+    Generate a synthetic HAR and time every pipeline stage on it.
+    Returns the report as a dict; the best (minimum) wall time of `repeat` runs is reported.
+    Without work_dir the generated files go to a temporary directory that is removed afterwards.
+    """
+    mime_mix = mime_mix or DEFAULT_MIME_MIX
+    temporary_dir = work_dir is None
+    if temporary_dir:
+        work_dir = tempfile.mkdtemp(prefix='har_benchmark_')
+    else:
+        os.makedirs(work_dir, exist_ok=True)
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        generate_synthetic_har('synthetic.har', entries, body_size, token_density, mime_mix, domains, seed)
+        os.makedirs('Request_body_template', exist_ok=True)
+        removed_domain = f"app{domains - 1}.bench.example"
+        # A copy with a parsed snapshot, so the other stages still parse synthetic.har
+        shutil.copyfile('synthetic.har', 'snapshot.har')
+        sum(1 for _ in iter_har_entries('snapshot.har', snapshot=True))
+
+        stages = [
+            ('har_load', lambda: sum(1 for _ in iter_har_entries('synthetic.har'))),
+            ('snapshot_load', lambda: sum(1 for _ in iter_har_entries('snapshot.har'))),
+            ('combine_har_files', lambda: pipeline.save_combined_har(pipeline.combine_har_files(['synthetic.har']), 'combined.har')),
+            ('remove_domains_from_har', lambda: pipeline.remove_domains_from_har('combined.har', [removed_domain, '.png'], 'filtered.har')),
+            ('analyze_har_for_occurrences', lambda: pipeline.analyze_har_for_occurrences_with_boundaries_concurrent(
+                'filtered.har', include_response_body=True, processes=processes)),
+            ('convert_to_k6_script', lambda: pipeline.main('filtered.har')),
+            ('mock_route_lookup', lambda: lookup_mock_routes('filtered.har')),
+            # combine + filter + analyze + generate from one streamed read
+            ('run_pipeline', lambda: pipeline.run_pipeline(
+                ['synthetic.har'], domains_to_remove=[removed_domain, '.png'], processes=processes, use_cache=False))
+        ]
+
+        report_stages = {}
+        for name, func in stages:
+            runs = [time_stage(func) for _ in range(repeat)]
+            wall, cpu = min(runs)
+            report_stages[name] = {
+                'wall_seconds': round(wall, 6),
+                'cpu_seconds': round(cpu, 6),
+                'entries_per_second': round(entries / wall, 1) if wall else None,
+                'runs_wall_seconds': [round(run_wall, 6) for run_wall, _ in runs]
+            }
+
+        return {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {
+                'entries': entries,
+                'body_size': body_size,
+                'token_density': token_density,
+                'mime_mix': mime_mix,
+                'domains': domains,
+                'seed': seed,
+                'repeat': repeat,
+                'processes': processes
+            },
+            'har_bytes': os.path.getsize('synthetic.har'),
+            'stages': report_stages
+        }
+    finally:
+        os.chdir(previous_dir)
+        if temporary_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def parse_mime_mix(value):
+    # "application/json:0.5,text/html:0.5"
+    mime_mix = {}
+    for item in value.split(','):
+        mime_type, _, weight = item.strip().rpartition(':')
+        mime_mix[mime_type] = float(weight)
+    return mime_mix
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the HAR analysis and k6 generation pipeline on a synthetic HAR.")
+    parser.add_argument('--entries', type=int, default=1000)
+    parser.add_argument('--body-size', type=int, default=2000, help="approximate response body size in characters")
+    parser.add_argument('--token-density', type=float, default=5.0, help="key=value tokens per 1000 body characters")
+    parser.add_argument('--mime-mix', type=parse_mime_mix, default=None, help="e.g. application/json:0.5,text/html:0.5")
+    parser.add_argument('--domains', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--processes', type=int, default=None, help="analyze with a process pool of this size (0 = one per CPU)")
+    parser.add_argument('--work-dir', default=None, help="keep generated files here instead of a temporary directory")
+    parser.add_argument('--output', default=None, help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        entries=args.entries, body_size=args.body_size, token_density=args.token_density,
+        mime_mix=args.mime_mix, domains=args.domains, seed=args.seed, repeat=args.repeat,
+        processes=args.processes, work_dir=args.work_dir
+    )
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(report_json + '\n')
+    else:
+        print(report_json)
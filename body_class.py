@@ -0,0 +1,91 @@
+import math
+import re
+from collections import Counter
+
+# Classification of request / response bodies before token scanning.
+#
+# Images, fonts, base64 payloads and minified bundles produce no correlations
+# but dominate scan time. Each body gets a class from (cheapest first) its
+# encoding, MIME type, size and an entropy sample of its text; skipped classes
+# are never tokenized, and the first three checks do not even read the body.
+# Scanned classes name the tokenizer the body is routed to.
+
+SKIPPED_CLASSES = ('base64', 'binary', 'script_bundle', 'stylesheet', 'high_entropy')
+SCANNED_CLASSES = ('json', 'form', 'text')
+
+BINARY_MIME_PREFIXES = ('image/', 'font/', 'audio/', 'video/', 'application/font', 'application/x-font')
+BINARY_MIME_TYPES = {
+    'application/octet-stream', 'application/pdf', 'application/zip', 'application/gzip',
+    'application/wasm', 'application/x-protobuf', 'application/protobuf', 'application/grpc',
+    'application/vnd.ms-fontobject'
+}
+SCRIPT_MIME_TYPES = {'application/javascript', 'text/javascript', 'application/x-javascript', 'application/ecmascript'}
+# Scripts below this size (inline config, small loaders) are still scanned
+SCRIPT_BUNDLE_MIN_BYTES = 16 * 1024
+# The entropy sample is only taken for bodies this large
+ENTROPY_MIN_BYTES = 4096
+ENTROPY_SAMPLE_CHARS = 256
+# Bits per character: base64 and compressed data sample at ~5.9 and above, text and JSON at 4-5
+ENTROPY_THRESHOLD = 5.5
+
+_json_start = re.compile(r'\s*[\[{]')
+
+
+def sample_entropy(text):
+    """
+    Shannon entropy (bits per character) of three windows: start, middle and end of text.
+    """
+    middle = len(text) // 2
+    sample = text[:ENTROPY_SAMPLE_CHARS] + text[middle:middle + ENTROPY_SAMPLE_CHARS] + text[-ENTROPY_SAMPLE_CHARS:]
+    total = len(sample)
+    return -sum(count / total * math.log2(count / total) for count in Counter(sample).values())
+
+
+def body_size(content):
+    # Recorded size, else the stored length of a lazy body, without reading it
+    size = content.get('size')
+    if isinstance(size, int) and size >= 0:
+        return size
+    span = getattr(content, 'span', None)
+    if span is not None:
+        return span[2]
+    return len(content.get('text') or '')
+
+
+def classify_metadata(content):
+    """
+    Skipped class decided from the encoding, MIME type and recorded size alone, or None
+    when the text has to be looked at.
+    """
+    mime_type = (content.get('mimeType') or '').split(';')[0].strip().lower()
+    if content.get('encoding') == 'base64':
+        return 'base64'
+    if mime_type in BINARY_MIME_TYPES or mime_type.startswith(BINARY_MIME_PREFIXES):
+        return 'binary'
+    size = content.get('size')
+    if (mime_type in SCRIPT_MIME_TYPES or mime_type == 'text/css') and isinstance(size, int) and size >= SCRIPT_BUNDLE_MIN_BYTES:
+        return 'script_bundle' if mime_type in SCRIPT_MIME_TYPES else 'stylesheet'
+    return None
+
+
+def classify_body(content):
+    """
+    Class of a HAR content / postData dict, one of SKIPPED_CLASSES or SCANNED_CLASSES.
+    """
+    body_class = classify_metadata(content)
+    if body_class is not None:
+        return body_class
+
+    mime_type = (content.get('mimeType') or '').split(';')[0].strip().lower()
+    is_script = mime_type in SCRIPT_MIME_TYPES
+    text = content.get('text') or ''
+    if (is_script or mime_type == 'text/css') and len(text) >= SCRIPT_BUNDLE_MIN_BYTES:
+        return 'script_bundle' if is_script else 'stylesheet'
+    if 'json' in mime_type or _json_start.match(text):
+        # Parsed and walked even when some fields are base64: the other fields can still correlate
+        return 'json'
+    if 'x-www-form-urlencoded' in mime_type:
+        return 'form'
+    if len(text) >= ENTROPY_MIN_BYTES and sample_entropy(text) >= ENTROPY_THRESHOLD:
+        return 'high_entropy'
+    return 'text'
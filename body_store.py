@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+
+# Content-addressed store for request bodies of the generated k6 script.
+#
+# Instead of one Transaction_N.txt per entry, every distinct body is written
+# once under its id (a prefix of the sha256). By default each one is its own
+# <id>.txt and transactions keep the request_body_template: '<path>' property
+# that existing k6 runners open(). With pack=True (--body-pack) the bodies are
+# appended to one pack file instead and an index maps each id to
+# [offset, length]; transactions then carry request_body: requestBody('<id>').
+# Offsets are in UTF-16 code units because that is how k6 (JavaScript) indexes
+# the string returned by open().
+
+PACK_FILE = 'bodies.pack'
+INDEX_FILE = 'bodies.index.json'
+BODY_ID_LENGTH = 16
+
+
+class BodyStore:
+    def __init__(self, folder_name, pack=False):
+        os.makedirs(folder_name, exist_ok=True)
+        self.folder_name = folder_name
+        self.pack = pack
+        self.index = {}
+        self.offset = 0
+        self.bodies_added = 0
+        self.closed = False
+        # newline='' so offsets are not shifted by \r\n translation on Windows
+        self.pack_file = open(os.path.join(folder_name, PACK_FILE), 'w', encoding='utf-8', newline='') if pack else None
+
+    def add(self, body):
+        """
+        Store body (once per distinct content) and return its id.
+        """
+        self.bodies_added += 1
+        body_id = hashlib.sha256(body.encode('utf-8')).hexdigest()[:BODY_ID_LENGTH]
+        if body_id in self.index:
+            return body_id
+        if self.pack:
+            length = len(body.encode('utf-16-le')) // 2
+            self.pack_file.write(body)
+            self.index[body_id] = [self.offset, length]
+            self.offset += length
+        else:
+            with open(os.path.join(self.folder_name, f'{body_id}.txt'), 'w', encoding='utf-8', newline='') as body_file:
+                body_file.write(body)
+            self.index[body_id] = None
+        return body_id
+
+    def template_path(self, body_id):
+        return f"./{self.folder_name}/{body_id}.txt"
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if not self.pack:
+            print(f"Request bodies: {len(self.index)} distinct of {self.bodies_added} stored in '{self.folder_name}/'.")
+            return
+        self.pack_file.close()
+        with open(os.path.join(self.folder_name, INDEX_FILE), 'w', encoding='utf-8') as index_file:
+            json.dump(self.index, index_file)
+        print(f"Request bodies: {len(self.index)} distinct of {self.bodies_added} stored in '{self.folder_name}/{PACK_FILE}'.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def k6_body_loader(folder_name):
+    """
+    k6 init-context code that reads the pack once and defines requestBody(id),
+    which slices (and memoizes) each distinct body on first use.
+    """
+    return (
+        f"const requestBodyPack = open('./{folder_name}/{PACK_FILE}');\n"
+        f"const requestBodyIndex = JSON.parse(open('./{folder_name}/{INDEX_FILE}'));\n"
+        "const requestBodyCache = {};\n"
+        "export function requestBody(id) {\n"
+        "  if (!(id in requestBodyCache)) {\n"
+        "    const [offset, length] = requestBodyIndex[id];\n"
+        "    requestBodyCache[id] = requestBodyPack.substring(offset, offset + length);\n"
+        "  }\n"
+        "  return requestBodyCache[id];\n"
+        "}\n\n"
+    )
+
+
+def k6_body_field(body_store, body_id):
+    # The page property that gives a transaction its body
+    if body_store.pack:
+        return f"    request_body: requestBody('{body_id}'),\n"
+    return f"    request_body_template: '{body_store.template_path(body_id)}',\n"
+
+
+def read_body(folder_name, body_id):
+    # Python-side lookup, e.g. for checking a generated script
+    body_path = os.path.join(folder_name, f'{body_id}.txt')
+    if os.path.exists(body_path):
+        with open(body_path, 'r', encoding='utf-8', newline='') as body_file:
+            return body_file.read()
+    with open(os.path.join(folder_name, INDEX_FILE), 'r', encoding='utf-8') as index_file:
+        offset, length = json.load(index_file)[body_id]
+    with open(os.path.join(folder_name, PACK_FILE), 'r', encoding='utf-8', newline='') as pack_file:
+        encoded = pack_file.read().encode('utf-16-le')
+    return encoded[offset * 2:(offset + length) * 2].decode('utf-16-le')
@@ -0,0 +1,108 @@
+import json
+
+# Producer -> consumer dataflow between the transactions of a recording.
+#
+# Transactions are fed in recording order. Values seen in a response (headers
+# or body) go into a hash index, newer producers replacing older ones; values
+# sent in a request are looked up in that index and linked to the most recent
+# earlier response that produced them. One pass, linear in the number of tokens.
+
+REQUEST_SECTIONS = ('URL', 'Request Header', 'Request Body')
+RESPONSE_SECTIONS = ('Response Header', 'Response Body')
+# Shorter values (flags, small numbers, "en") match by accident far more often than by dataflow
+MIN_VALUE_LENGTH = 6
+
+
+class Producer:
+    __slots__ = ('transaction', 'section', 'key', 'boundary', 'json_path', 'header_name')
+
+    def __init__(self, result):
+        self.transaction = result['transaction']
+        self.section = result['section']
+        self.key = result['key_value'].split('=', 1)[0]
+        self.boundary = result['boundary']
+        self.json_path = result['json_path']
+        self.header_name = result.get('header_name')
+
+
+class DataflowGraph:
+    def __init__(self, min_value_length=MIN_VALUE_LENGTH):
+        self.min_value_length = min_value_length
+        self.producers = {}
+        # Values the client sent before any response produced them are constants, not correlations
+        self.client_values = set()
+        self.edges = []
+        self.transactions = 0
+
+    def add_transaction(self, transaction_results):
+        """
+        Link the request tokens of one transaction, then index its response tokens.
+        Transactions must be added in recording order.
+        """
+        if not transaction_results:
+            return
+        transaction = transaction_results[0]['transaction']
+        self.transactions = max(self.transactions, transaction)
+        linked_values = set()
+        for result in transaction_results:
+            if result['section'] not in REQUEST_SECTIONS:
+                continue
+            value = result['key_value'].split('=', 1)[1]
+            if len(value) < self.min_value_length or value in linked_values:
+                continue
+            producer = self.producers.get(value)
+            if producer is None:
+                self.client_values.add(value)
+                continue
+            linked_values.add(value)
+            self.edges.append((producer, transaction, result['section'], result['key_value'].split('=', 1)[0], value))
+
+        for result in transaction_results:
+            if result['section'] not in RESPONSE_SECTIONS:
+                continue
+            value = result['key_value'].split('=', 1)[1]
+            if len(value) < self.min_value_length or value in self.client_values:
+                continue
+            self.producers[value] = Producer(result)
+
+    def used_producers(self):
+        """
+        (producer, value) for every response value some later request consumed,
+        once per producing transaction, in recording order.
+        """
+        seen = set()
+        used = []
+        for producer, consumer, consumer_section, consumer_key, value in self.edges:
+            if (producer.transaction, value) not in seen:
+                seen.add((producer.transaction, value))
+                used.append((producer, value))
+        used.sort(key=lambda item: item[0].transaction)
+        return used
+
+    def to_dict(self):
+        dependencies = {}
+        edges = []
+        for producer, consumer, consumer_section, consumer_key, value in self.edges:
+            dependencies.setdefault(consumer, set()).add(producer.transaction)
+            edges.append({
+                'producer': producer.transaction,
+                'consumer': consumer,
+                'value': value,
+                'producer_section': producer.section,
+                'producer_key': producer.key,
+                'json_path': producer.json_path,
+                'header_name': producer.header_name,
+                'consumer_section': consumer_section,
+                'consumer_key': consumer_key
+            })
+        return {
+            'transactions': self.transactions,
+            # consumer transaction -> transactions whose responses it depends on
+            'dependencies': {str(consumer): sorted(producers) for consumer, producers in sorted(dependencies.items())},
+            'edges': edges
+        }
+
+    def write(self, graph_file_path):
+        with open(graph_file_path, 'w', encoding='utf-8') as graph_file:
+            json.dump(self.to_dict(), graph_file, indent=2)
+        print(f"Dependency graph saved to '{graph_file_path}'.")
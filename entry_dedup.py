@@ -0,0 +1,110 @@
+import hashlib
+from collections import OrderedDict
+
+from body_class import SKIPPED_CLASSES, classify_body, classify_metadata
+from har_stream import dumps
+from lazy_body import LazyContent, span_digest
+
+# Collapsing of repeated entries (polling, repeated asset fetches, retries)
+# before analysis.
+#
+# An entry is fingerprinted by the request and response parts the token scan
+# reads: url, method, status, headers and bodies. Headers that cannot yield a
+# token (no '=', no escape normalize_text could decode into one, not JSON;
+# e.g. Date or request ids) and bodies of skipped classes are left out, so a
+# repeat that only differs there still matches and gets exactly the results of
+# its first occurrence, renumbered. A body still in the file is fingerprinted
+# by its stored bytes, so it is not read. Only the last `window` distinct
+# fingerprints are kept.
+
+DEDUP_WINDOW = 4096
+
+
+def _may_yield_tokens(value):
+    # '%' and '\\' escapes are decoded before the key=value scan (see normalize.py) and may turn into '='
+    return '=' in value or '%' in value or '\\' in value or value.lstrip().startswith(('[', '{'))
+
+
+def _header_part(headers):
+    return [[header['name'], header['value']] for header in headers if _may_yield_tokens(header['value'])]
+
+
+def _body_part(content):
+    if content is None:
+        return None
+    body_class = classify_metadata(content)
+    if body_class is not None:
+        return body_class
+    if isinstance(content, LazyContent) and content.source is not None:
+        return [content.get('mimeType', ''), span_digest(content.source)]
+    body_class = classify_body(content)
+    if body_class in SKIPPED_CLASSES:
+        return body_class
+    return [content.get('mimeType', ''), content.get('text')]
+
+
+def entry_fingerprint(entry):
+    request = entry['request']
+    response = entry['response']
+    parts = [
+        request.get('method', ''), request['url'], _header_part(request['headers']), _body_part(request.get('postData')),
+        response['status'], _header_part(response['headers']), _body_part(response.get('content'))
+    ]
+    return hashlib.blake2b(dumps(parts).encode('utf-8'), digest_size=16).digest()
+
+
+class Pending:
+    """
+    Stands in for the results of a repeat whose first occurrence is still being analyzed.
+    """
+    __slots__ = ('fingerprint', 'idx')
+
+    def __init__(self, fingerprint, idx):
+        self.fingerprint = fingerprint
+        self.idx = idx
+
+
+class EntryDedup:
+    def __init__(self, window=DEDUP_WINDOW):
+        self.window = window
+        # fingerprint -> results of the first occurrence, None while it is in flight
+        self.results = OrderedDict()
+        self.reused = 0
+        self.analyzed = 0
+
+    def reuse(self, fingerprint, idx):
+        """
+        Results for entry idx if an identical entry was seen: a list once the first one
+        is merged, a Pending while it is in flight. None means entry idx must be analyzed.
+        """
+        if fingerprint not in self.results:
+            self.analyzed += 1
+            self.results[fingerprint] = None
+            return None
+        self.reused += 1
+        self.results.move_to_end(fingerprint)
+        transaction_results = self.results[fingerprint]
+        if transaction_results is None:
+            return Pending(fingerprint, idx)
+        return self._renumber(transaction_results, idx)
+
+    def settle(self, fingerprint, transaction_results):
+        """
+        Called in transaction order as results are merged: remembers the results of a
+        first occurrence and resolves Pending ones.
+        """
+        if isinstance(transaction_results, Pending):
+            return self._renumber(self.results[transaction_results.fingerprint], transaction_results.idx)
+        if fingerprint is not None and self.results.get(fingerprint) is None:
+            self.results[fingerprint] = transaction_results
+            while len(self.results) > self.window:
+                self.results.popitem(last=False)
+        return transaction_results
+
+    @staticmethod
+    def _renumber(transaction_results, idx):
+        return [{**result, 'transaction': idx + 1} for result in transaction_results]
+
+    def report(self):
+        if self.reused:
+            print(f"Dedup: {self.reused} repeated entries reused the results of {self.analyzed} distinct ones")
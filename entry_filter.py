@@ -0,0 +1,137 @@
+import posixpath
+import re
+from urllib.parse import urlsplit
+
+# Compiled deny-list filter for HAR entries.
+#
+# Rules are the comma separated values typed at the prompt:
+#   .js .png .woff      path extension; a single label also matches as a TLD (.net, .ai)
+#   .co.in              host suffix, label aligned (cdn.example.com also matches
+#   cdn.example.com     a.cdn.example.com), or else a substring of the URL, so
+#   jquery.min.js       file names like .min.js or gtm.js still match anywhere
+#   google paypal       substring of the URL (one combined regex for all words)
+#   re:<regex>          regular expression searched in the URL
+#   mime:image/         response MIME type prefix
+#   status:404 / 4xx    response status code or class; other values are reported and ignored
+# Every entry is checked with a few set and trie lookups, independent of the
+# number of rules. Only the URL, status and MIME type are read, never bodies.
+
+
+class EntryFilter:
+    def __init__(self, rules):
+        self.rules = []
+        self.extensions = {}
+        self.host_trie = {}
+        self.words = {}
+        self.regexes = []
+        self.mime_prefixes = []
+        self.statuses = {}
+        self.status_classes = {}
+        for rule in rules:
+            rule = rule.strip()
+            if not rule or rule in self.rules:
+                continue
+            if self._compile_rule(rule):
+                self.rules.append(rule)
+        self.word_pattern = re.compile('|'.join(re.escape(word) for word in sorted(self.words, key=len, reverse=True))) if self.words else None
+        self.drop_counts = {rule: 0 for rule in self.rules}
+        self.kept = 0
+
+    def _compile_rule(self, rule):
+        # False for a rule that cannot be compiled: it is reported and left out
+        lowered = rule.lower()
+        if lowered.startswith('re:'):
+            try:
+                self.regexes.append((re.compile(rule[3:]), rule))
+            except re.error as error:
+                print(f"Ignoring filter rule '{rule}': {error}")
+                return False
+        elif lowered.startswith('mime:'):
+            self.mime_prefixes.append((lowered[5:], rule))
+        elif lowered.startswith('status:'):
+            status = lowered[7:].strip()
+            if re.fullmatch(r'[1-9]xx', status):
+                self.status_classes[int(status[0])] = rule
+            elif re.fullmatch(r'[1-9][0-9]{2}', status):
+                self.statuses[int(status)] = rule
+            else:
+                print(f"Ignoring filter rule '{rule}': expected a status code like 404 or a class like 4xx")
+                return False
+        elif lowered.startswith('.') and '.' not in lowered[1:] and '/' not in lowered:
+            self.extensions[lowered[1:]] = rule
+            self._add_host_suffix(lowered[1:], rule)
+        elif '.' in lowered and '/' not in lowered:
+            # A file name like gtm.js or .min.js is no host: the substring match still catches it
+            self._add_host_suffix(lowered.lstrip('.'), rule)
+            self.words[rule] = rule
+        else:
+            self.words[rule] = rule
+        return True
+
+    def _add_host_suffix(self, suffix, rule):
+        node = self.host_trie
+        for label in reversed(suffix.split('.')):
+            node = node.setdefault(label, {})
+        node.setdefault(None, rule)
+
+    def _host_rule(self, host):
+        node = self.host_trie
+        for label in reversed(host.split('.')):
+            node = node.get(label)
+            if node is None:
+                return None
+            if None in node:
+                return node[None]
+        return None
+
+    def match(self, entry):
+        """
+        The rule that drops this entry, or None to keep it.
+        """
+        response = entry.get('response', {})
+        status = response.get('status')
+        if status is not None:
+            rule = self.statuses.get(status) or self.status_classes.get(status // 100)
+            if rule:
+                return rule
+        if self.mime_prefixes:
+            # Some recorders write "mimeType": null
+            mime_type = ((response.get('content') or {}).get('mimeType') or '').split(';')[0].strip().lower()
+            for prefix, rule in self.mime_prefixes:
+                if mime_type.startswith(prefix):
+                    return rule
+
+        url = entry['request']['url']
+        if self.extensions or self.host_trie:
+            parts = urlsplit(url)
+            extension = posixpath.splitext(parts.path)[1][1:].lower()
+            if extension in self.extensions:
+                return self.extensions[extension]
+            host = (parts.hostname or '').rstrip('.')
+            if host and self.host_trie:
+                rule = self._host_rule(host)
+                if rule:
+                    return rule
+        if self.word_pattern is not None:
+            found = self.word_pattern.search(url)
+            if found:
+                return self.words[found.group()]
+        for pattern, rule in self.regexes:
+            if pattern.search(url):
+                return rule
+        return None
+
+    def __call__(self, entry):
+        # Keep predicate for streaming filters; counts what every rule dropped
+        rule = self.match(entry)
+        if rule is None:
+            self.kept += 1
+            return True
+        self.drop_counts[rule] += 1
+        return False
+
+    def report(self):
+        dropped = sum(self.drop_counts.values())
+        print(f"Filter kept {self.kept} entries, dropped {dropped}:")
+        for rule, count in sorted(self.drop_counts.items(), key=lambda item: -item[1]):
+            print(f"  {rule}: {count}")
@@ -0,0 +1,185 @@
+import hashlib
+import marshal
+import os
+import struct
+import sys
+
+from lazy_body import LazyContent, release
+
+# Parsed-HAR snapshot.
+#
+# Re-parsing a multi-GB HAR for every run is dominated by decoding its bodies.
+# A snapshot stores the parsed entries once, next to the HAR:
+#   <har>.snap       entry skeletons as marshal records, bodies replaced by spans,
+#                    followed by a header (source fingerprint, log fields)
+#   <har>.snap.blob  the body texts, UTF-8, back to back
+# iter_har_entries reads the snapshot instead of the HAR while the HAR still
+# has the recorded size and mtime, or failing that the recorded SHA-256. Bodies
+# come back as LazyContent views into the memory-mapped blob, so a reload only
+# reads the bodies a consumer actually uses.
+
+SNAPSHOT_SUFFIX = '.snap'
+BLOB_SUFFIX = '.snap.blob'
+FORMAT_VERSION = 1
+
+_MAGIC = b'HARSNAP1'
+_record_length = struct.Struct('<I')
+_footer = struct.Struct('<Q8s')
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(har_file_path):
+    stat = os.stat(har_file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_sha256(har_file_path)}
+
+
+def _source_matches(har_file_path, source):
+    try:
+        stat = os.stat(har_file_path)
+    except OSError:
+        return False
+    if stat.st_size != source['size']:
+        return False
+    # Same size and mtime: unchanged. Same size only (copied, touched): compare contents
+    return stat.st_mtime_ns == source['mtime_ns'] or file_sha256(har_file_path) == source['sha256']
+
+
+class SnapshotWriter:
+    """
+    Builds the snapshot of har_file_path from its entries, one at a time, e.g.
+    while the HAR is being parsed anyway. Nothing replaces an existing snapshot
+    until close(); abort() discards the partial files.
+    """
+
+    def __init__(self, har_file_path):
+        self.har_file_path = har_file_path
+        self.snapshot_path = har_file_path + SNAPSHOT_SUFFIX
+        self.blob_path = har_file_path + BLOB_SUFFIX
+        # Unique temp names: the same HAR can be snapshotted as an input and as the output of one run
+        temp_suffix = f'.{os.getpid()}.{id(self):x}.tmp'
+        self.index_temp_path = self.snapshot_path + temp_suffix
+        self.blob_temp_path = self.blob_path + temp_suffix
+        self.index_file = open(self.index_temp_path, 'wb')
+        self.blob_file = open(self.blob_temp_path, 'wb')
+        self.index_file.write(_MAGIC)
+        self.blob_size = 0
+        self.count = 0
+
+    def _store_body(self, content):
+        # (span, skeleton) for a content / postData dict with a text body, else (None, content)
+        if not isinstance(content, dict) or not isinstance(content.get('text'), str):
+            return None, content
+        data = content['text'].encode('utf-8')
+        span = (self.blob_size, len(data))
+        self.blob_file.write(data)
+        self.blob_size += len(data)
+        skeleton = dict(content)
+        skeleton['text'] = None
+        return span, skeleton
+
+    def write(self, entry):
+        request = entry.get('request') or {}
+        response = entry.get('response') or {}
+        post_span, post_data = self._store_body(request.get('postData'))
+        content_span, content = self._store_body(response.get('content'))
+        if post_span is not None:
+            request = dict(request, postData=post_data)
+        if content_span is not None:
+            response = dict(response, content=content)
+        if post_span is not None or content_span is not None:
+            entry = dict(entry, request=request, response=response)
+        record = marshal.dumps((entry, post_span, content_span))
+        self.index_file.write(_record_length.pack(len(record)))
+        self.index_file.write(record)
+        self.count += 1
+
+    def close(self, log_fields=None):
+        # Called once the HAR itself is complete: its fingerprint goes into the header
+        header = marshal.dumps({
+            'format': FORMAT_VERSION,
+            'python': list(sys.version_info[:2]),
+            'source': source_fingerprint(self.har_file_path),
+            'log_fields': dict(log_fields or {}),
+            'entries': self.count,
+            'blob_size': self.blob_size
+        })
+        self.index_file.write(header)
+        self.index_file.write(_footer.pack(len(header), _MAGIC))
+        self.index_file.close()
+        self.blob_file.close()
+        release(os.path.abspath(self.blob_path))
+        os.replace(self.blob_temp_path, self.blob_path)
+        os.replace(self.index_temp_path, self.snapshot_path)
+        return self.count
+
+    def abort(self):
+        self.index_file.close()
+        self.blob_file.close()
+        for temp_path in (self.index_temp_path, self.blob_temp_path):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def open_snapshot(har_file_path):
+    """
+    Header of the snapshot of har_file_path, or None when there is none or it
+    does not match the HAR (or this Python's marshal format).
+    """
+    snapshot_path = har_file_path + SNAPSHOT_SUFFIX
+    blob_path = har_file_path + BLOB_SUFFIX
+    if not os.path.exists(snapshot_path) or not os.path.exists(blob_path):
+        return None
+    try:
+        with open(snapshot_path, 'rb') as snapshot_file:
+            snapshot_size = snapshot_file.seek(0, os.SEEK_END)
+            snapshot_file.seek(snapshot_size - _footer.size)
+            header_length, magic = _footer.unpack(snapshot_file.read(_footer.size))
+            if magic != _MAGIC:
+                return None
+            index_end = snapshot_size - _footer.size - header_length
+            snapshot_file.seek(index_end)
+            header = marshal.loads(snapshot_file.read(header_length))
+    except (OSError, ValueError, EOFError, TypeError, struct.error):
+        return None
+    if not isinstance(header, dict) or header.get('format') != FORMAT_VERSION or header.get('python') != list(sys.version_info[:2]):
+        return None
+    if os.path.getsize(blob_path) != header['blob_size'] or not _source_matches(har_file_path, header['source']):
+        return None
+    header['index_end'] = index_end
+    return header
+
+
+def iter_snapshot_entries(har_file_path, header, log_fields=None):
+    """
+    Yield the entries stored in the snapshot of har_file_path (header from open_snapshot).
+    """
+    if log_fields is not None:
+        log_fields.update(header['log_fields'])
+    blob_path = os.path.abspath(har_file_path + BLOB_SUFFIX)
+    with open(har_file_path + SNAPSHOT_SUFFIX, 'rb') as snapshot_file:
+        position = snapshot_file.seek(len(_MAGIC))
+        while position < header['index_end']:
+            (record_length,) = _record_length.unpack(snapshot_file.read(_record_length.size))
+            entry, post_span, content_span = marshal.loads(snapshot_file.read(record_length))
+            position += _record_length.size + record_length
+            if post_span is not None:
+                entry['request']['postData'] = LazyContent(entry['request']['postData'], (blob_path,) + post_span)
+            if content_span is not None:
+                entry['response']['content'] = LazyContent(entry['response']['content'], (blob_path,) + content_span)
+            yield entry
+
+
+# python har_snapshot.py combined.har [more.har ...]   (write or refresh the snapshots)
+if __name__ == "__main__":
+    from har_stream import iter_har_entries
+
+    for har_file_path in sys.argv[1:]:
+        count = sum(1 for _ in iter_har_entries(har_file_path, snapshot=True))
+        print(f"Snapshot of '{har_file_path}': {count} entries.")
@@ -0,0 +1,450 @@
+import codecs
+import gzip
+import io
+import json
+import os
+import re
+
+from har_snapshot import SnapshotWriter, iter_snapshot_entries, open_snapshot
+from lazy_body import LazyContent, materialize, read_span, release
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Incremental HAR reader.
+#
+# json.load() needs the whole recording in memory (plus the decoded objects),
+# which does not work for multi-GB HARs with base64 bodies. The reader below
+# walks the outer HAR object by hand and decodes one entry at a time with
+# JSONDecoder.raw_decode, so memory stays proportional to the largest entry.
+# In an uncompressed HAR, long bodies are not decoded at all: they stay in the
+# file and are read through a memory map when used (see _LazyBodyStream).
+
+CHUNK_SIZE = 1 << 20
+# Body literals (the "text" of content / postData) from this size on are left in the file
+LAZY_BODY_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+_decoder = json.JSONDecoder()
+_scanstring = json.decoder.scanstring
+_whitespace = re.compile(r'[ \t\n\r]*')
+_body_key = re.compile(r'"text"[ \t\n\r]*:[ \t\n\r]*"')
+# Held back at the end of a read in case a "text": key is split across two reads
+_KEY_TAIL = 64
+_BODY_PLACEHOLDER = '\x00body:'
+
+
+def _string_end(text, start):
+    # End (past the closing quote) of the JSON string literal whose content starts at start, or -1.
+    # json's C scanner is by far the fastest way to find it; the decoded value is dropped.
+    try:
+        return _scanstring(text, start, False)[1]
+    except json.JSONDecodeError:
+        return -1
+
+
+def _compression(file_path, mode):
+    # Reading trusts the magic bytes, writing goes by the extension (.gz, .zst)
+    if mode == 'r':
+        with open(file_path, 'rb') as raw_file:
+            magic = raw_file.read(4)
+        if magic.startswith(_GZIP_MAGIC):
+            return 'gzip'
+        if magic == _ZSTD_MAGIC:
+            return 'zstd'
+        return None
+    lowered = file_path.lower()
+    if lowered.endswith('.gz'):
+        return 'gzip'
+    if lowered.endswith(('.zst', '.zstd')):
+        return 'zstd'
+    return None
+
+
+def open_har(file_path, mode='r'):
+    """
+    Open a HAR for text reading ('r') or writing ('w'), transparently (de)compressing
+    gzip and zstd. zstd needs the optional zstandard package.
+    """
+    compression = _compression(file_path, mode)
+    if compression == 'gzip':
+        return gzip.open(file_path, mode + 't', encoding='utf-8', compresslevel=GZIP_LEVEL)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError(f"zstd support for {file_path} needs the 'zstandard' package")
+        if mode == 'r':
+            return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True), encoding='utf-8')
+        return io.TextIOWrapper(zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(file_path, 'wb'), closefd=True), encoding='utf-8')
+    return open(file_path, mode, encoding='utf-8')
+
+
+def dumps(value, indent=None, sort_keys=False):
+    # orjson when installed (several times faster), same output shape as json.dumps(ensure_ascii=False)
+    if orjson is not None and indent in (None, 2):
+        options = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(value, option=options).decode('utf-8')
+        except TypeError:
+            pass
+    separators = None if indent else (',', ':')
+    return json.dumps(value, ensure_ascii=False, indent=indent, sort_keys=sort_keys, separators=separators)
+
+
+class _JsonStream:
+    def __init__(self, fh):
+        self.fh = fh
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        # Drop what was already consumed before appending the next chunk
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.fh.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill(CHUNK_SIZE):
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        # Grow the read size geometrically so a huge entry is re-decoded only
+        # O(log n) times instead of once per chunk.
+        size = CHUNK_SIZE
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                # A value that ends exactly at the buffer end may be a truncated number
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+
+class _LazyBodyStream(_JsonStream):
+    """
+    _JsonStream over an uncompressed HAR read in binary. Body literals of at
+    least LAZY_BODY_MIN_BYTES are cut out of the bytes before they are decoded
+    and replaced by a placeholder string; decoded entries get a LazyContent
+    with the literal's span in the file instead.
+    """
+
+    def __init__(self, fh, file_path):
+        super().__init__(fh)
+        self.file_path = os.path.abspath(file_path)
+        # Map the file as it is now, not as an earlier read of the same path saw it
+        release(self.file_path)
+        # raw[0] is the byte before the unconverted input (for the backslash check); raw_offset is its file offset
+        self.raw = b' '
+        self.raw_offset = -1
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        # Character position of buf[0] in the converted text, to tell which placeholders a value contains
+        self.buf_offset = 0
+        # placeholder id -> (file offset, length, position in the converted text), in file order
+        self.spans = {}
+        self.next_span = 0
+
+    def _fill(self, size):
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.buf_offset += self.pos
+            self.pos = 0
+        chunk = self.fh.read(size)
+        if not chunk:
+            if len(self.raw) > 1:
+                self.buf += self._cut_bodies(final=True)
+                return True
+            self.eof = True
+            return False
+        self.raw += chunk
+        self.buf += self._cut_bodies(final=False)
+        return True
+
+    def _cut_bodies(self, final):
+        raw = self.raw
+        # Searched as latin-1: one character per byte, so indexes are file offsets, and
+        # '"' / '\\' never occur inside a multi-byte UTF-8 sequence
+        latin = raw.decode('latin-1')
+        parts = []
+        converted = self.buf_offset + len(self.buf)
+        position = search_from = 1
+        end = len(raw)
+        while True:
+            key = _body_key.search(latin, search_from)
+            if key is None:
+                if not final:
+                    end = max(position, len(raw) - _KEY_TAIL)
+                break
+            if latin[key.start() - 1] == '\\':
+                # An escaped quote: "text" inside some string, not a key
+                search_from = key.start() + 1
+                continue
+            literal_start = key.end() - 1
+            literal_end = _string_end(latin, literal_start + 1)
+            if literal_end == -1:
+                if not final:
+                    # The body continues in the next read
+                    end = key.start()
+                break
+            search_from = literal_end
+            if literal_end - literal_start < LAZY_BODY_MIN_BYTES:
+                continue
+            part = self.text_decoder.decode(raw[position:literal_start])
+            parts.append(part)
+            converted += len(part)
+            span_id = self.next_span
+            self.next_span += 1
+            self.spans[span_id] = (self.raw_offset + literal_start, literal_end - literal_start, converted)
+            part = f'"\\u0000body:{span_id}"'
+            parts.append(part)
+            converted += len(part)
+            position = literal_end
+        parts.append(self.text_decoder.decode(raw[position:end], final))
+        self.raw = raw[end - 1:]
+        self.raw_offset += end - 1
+        return ''.join(parts)
+
+    def _span_id(self, value):
+        if isinstance(value, str) and value.startswith(_BODY_PLACEHOLDER):
+            span_id = value[len(_BODY_PLACEHOLDER):]
+            if span_id.isdigit() and int(span_id) in self.spans:
+                return int(span_id)
+        return None
+
+    def value(self):
+        obj = super().value()
+        if not self.spans:
+            return obj
+        if isinstance(obj, dict):
+            for section, field in (('request', 'postData'), ('response', 'content')):
+                content = obj.get(section, {}).get(field)
+                span_id = self._span_id(content.get('text')) if isinstance(content, dict) else None
+                if span_id is not None:
+                    offset, length, _ = self.spans.pop(span_id)
+                    obj[section][field] = LazyContent(content, (self.file_path, offset, length, True))
+        # Any other cut literal in this value (a "text" key elsewhere) is read back right away
+        first = next(iter(self.spans.values()), None)
+        if first is not None and first[2] < self.buf_offset + self.pos:
+            obj = self._read_placeholders(obj)
+        return obj
+
+    def _read_placeholders(self, value):
+        if isinstance(value, LazyContent):
+            return value
+        if isinstance(value, dict):
+            for key, item in value.items():
+                value[key] = self._read_placeholders(item)
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                value[index] = self._read_placeholders(item)
+        else:
+            span_id = self._span_id(value)
+            if span_id is not None:
+                offset, length, _ = self.spans.pop(span_id)
+                return read_span(self.file_path, offset, length, True)
+        return value
+
+
+def _seek_entries(stream, log_fields, nested=False):
+    # Position the stream on the entries array; supports both {"log": {"entries": [...]}}
+    # and a bare {"entries": [...]}. Small sibling fields are decoded into log_fields.
+    stream.expect('{')
+    while True:
+        char = stream.peek()
+        if char == '}':
+            stream.pos += 1
+            return False
+        if char == ',':
+            stream.pos += 1
+            continue
+        key = stream.value()
+        stream.expect(':')
+        if key == 'entries' and stream.peek() == '[':
+            return True
+        if key == 'log' and not nested and stream.peek() == '{':
+            if _seek_entries(stream, log_fields, nested=True):
+                return True
+            continue
+        value = stream.value()
+        if log_fields is not None and (nested or key != 'log'):
+            log_fields[key] = value
+
+
+def _iter_array(stream):
+    stream.expect('[')
+    if stream.peek() == ']':
+        stream.pos += 1
+        return
+    while True:
+        yield stream.value()
+        char = stream.peek()
+        stream.pos += 1
+        if char == ']':
+            return
+        if char != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", stream.buf, stream.pos - 1)
+
+
+def iter_har_entries(har_file_path, log_fields=None, snapshot=False):
+    """
+    Yield the entries of a HAR file one at a time.
+    If log_fields is a dict it receives the log-level fields (version, creator,
+    pages, ...) that appear before the entries array.
+    A matching snapshot (see har_snapshot.py) is read instead of the HAR; with
+    snapshot=True a missing or stale one is written while the HAR is parsed.
+    """
+    header = open_snapshot(har_file_path)
+    if header is not None:
+        yield from iter_snapshot_entries(har_file_path, header, log_fields)
+        return
+
+    writer = SnapshotWriter(har_file_path) if snapshot else None
+    if writer is not None and log_fields is None:
+        log_fields = {}
+    # Bodies are only left in the file when it can be mapped, i.e. is not compressed
+    lazy_bodies = _compression(har_file_path, 'r') is None
+    try:
+        with (open(har_file_path, 'rb') if lazy_bodies else open_har(har_file_path, 'r')) as har_file:
+            stream = _LazyBodyStream(har_file, har_file_path) if lazy_bodies else _JsonStream(har_file)
+            if not _seek_entries(stream, log_fields):
+                print(f"Invalid HAR structure in {har_file_path}")
+                return
+            for entry in _iter_array(stream):
+                if writer is not None:
+                    writer.write(entry)
+                yield entry
+        if writer is not None:
+            writer.close(log_fields)
+            writer = None
+    finally:
+        # Stopped early or failed: the partial snapshot is discarded
+        if writer is not None:
+            writer.abort()
+
+
+def iter_har_files(file_paths, snapshot=False):
+    """
+    Yield the entries of several HAR files as one logical stream.
+    """
+    for file_path in file_paths:
+        yield from iter_har_entries(file_path, snapshot=snapshot)
+
+
+class HarEntries:
+    """
+    Re-iterable view over one or more HAR files. Every iteration streams the
+    files again, optionally mapping each entry through transform. With snapshot
+    the first pass writes snapshots that the later passes read.
+    """
+
+    def __init__(self, file_paths, transform=None, snapshot=False):
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        self.file_paths = list(file_paths)
+        self.transform = transform
+        self.snapshot = snapshot
+
+    def __iter__(self):
+        try:
+            for entry in iter_har_files(self.file_paths, self.snapshot):
+                yield self.transform(entry) if self.transform else entry
+        except json.JSONDecodeError as e:
+            print(f"Error decoding JSON: {e}")
+
+
+class HarWriter:
+    """
+    Incremental HAR writer: entries are written one at a time as they arrive,
+    e.g. while the same stream is being analyzed. Output is compact unless an
+    indent is given, and compressed for .gz / .zst paths. The entries go to a
+    temp file that replaces the output on close(), so the output may also be
+    one of the inputs being read; abort() leaves the output untouched.
+    """
+
+    def __init__(self, output_file_path, log_fields=None, indent=None):
+        log_fields = dict(log_fields or {})
+        log_fields.setdefault('version', '1.2')
+        log_fields.pop('entries', None)
+        self.log_fields = log_fields
+        self.indent = indent
+        self.separator = ',\n' if indent else ','
+        self.count = 0
+        self.output_file_path = output_file_path
+        # Keep the output extension last so the compression choice follows output_file_path
+        self.temp_file_path = os.path.join(os.path.dirname(output_file_path), '.tmp.' + os.path.basename(output_file_path))
+        self.output_file = open_har(self.temp_file_path, 'w')
+        self.output_file.write('{"log": {')
+        for key, value in log_fields.items():
+            self.output_file.write(json.dumps(key) + ': ' + dumps(value) + ', ')
+        self.output_file.write('"entries": [\n' if indent else '"entries": [')
+
+    def write(self, entry):
+        if self.count:
+            self.output_file.write(self.separator)
+        self.output_file.write(dumps(materialize(entry), self.indent))
+        self.count += 1
+
+    def close(self):
+        if not self.output_file.closed:
+            self.output_file.write('\n]}}\n' if self.indent else ']}}\n')
+            self.output_file.close()
+            # Entries read lazily from the output must not see it replaced under them
+            release(os.path.abspath(self.output_file_path))
+            os.replace(self.temp_file_path, self.output_file_path)
+        return self.count
+
+    def abort(self):
+        if not self.output_file.closed:
+            self.output_file.close()
+            os.remove(self.temp_file_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_har(entries, output_file_path, log_fields=None, indent=None):
+    """
+    Write entries (any iterable) as a HAR file without materializing them.
+    """
+    with HarWriter(output_file_path, log_fields, indent) as writer:
+        for entry in entries:
+            writer.write(entry)
+    return writer.count
@@ -0,0 +1,79 @@
+from collections import Counter
+
+# Header interning for the generated k6 script.
+#
+# Most transactions of a recording send the same browser headers, so instead of
+# one headers object per transaction the script gets one object per distinct
+# header set. Headers shared by most sets live once in headers_common and the
+# sets spread it and add their own overrides.
+
+COMMON_HEADER_SHARE = 0.5
+
+
+def header_key(headers):
+    # HAR headers are a list and may repeat a name; like the JS object literal, the last value wins
+    return tuple({header['name']: header['value'] for header in headers}.items())
+
+
+class HeaderSets:
+    def __init__(self):
+        self.ids = {}
+        self.sets = []
+        self.uses = []
+
+    def add(self, headers):
+        """
+        Intern the headers of one transaction and return the variable name to reference.
+        """
+        key = header_key(headers)
+        set_id = self.ids.get(key)
+        if set_id is None:
+            set_id = len(self.sets)
+            self.ids[key] = set_id
+            self.sets.append(key)
+            self.uses.append(0)
+        self.uses[set_id] += 1
+        return header_variable(set_id)
+
+    def variables(self):
+        return [header_variable(set_id) for set_id in range(len(self.sets))]
+
+    def common_headers(self):
+        # Most frequent value per name, kept if that pair appears in at least COMMON_HEADER_SHARE of the transactions
+        total = sum(self.uses)
+        pair_uses = Counter()
+        for key, uses in zip(self.sets, self.uses):
+            for pair in key:
+                pair_uses[pair] += uses
+        common = {}
+        for (name, value), uses in pair_uses.most_common():
+            if name not in common and uses >= total * COMMON_HEADER_SHARE:
+                common[name] = value
+        return common
+
+    def to_js(self):
+        common = self.common_headers()
+        script = ''
+        if common:
+            script += 'export let headers_common = {\n'
+            for name, value in common.items():
+                script += f"  '{name}': '{value}',\n"
+            script += '}\n\n'
+
+        for set_id, key in enumerate(self.sets):
+            header_names = {name for name, value in key}
+            script += f'export let {header_variable(set_id)} = {{\n'
+            if common and header_names.issuperset(common):
+                # Only the headers that differ from headers_common are written out
+                script += '  ...headers_common,\n'
+                overrides = [(name, value) for name, value in key if common.get(name) != value]
+            else:
+                overrides = key
+            for name, value in overrides:
+                script += f"  '{name}': '{value}',\n"
+            script += '}\n\n'
+        return script
+
+
+def header_variable(set_id):
+    return f'headers_{set_id + 1:02}'
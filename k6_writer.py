@@ -0,0 +1,92 @@
+import os
+
+# Streaming writer for the generated k6 script.
+#
+# Sections are written to disk as they are produced instead of being collected
+# in one string. With transactions_per_file the script is split into modules:
+#
+#   Generated_K6script.js           imports, PageDef (merged), flowdef, method counts
+#   Generated_K6script_shared.js    body loader and header sets
+#   Generated_K6script_pages_N.js   PageDef_N with up to transactions_per_file transactions
+
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+class K6ScriptWriter:
+    def __init__(self, output_file_path, transactions_per_file=None):
+        self.output_file_path = output_file_path
+        self.transactions_per_file = transactions_per_file
+        stem, _ = os.path.splitext(output_file_path)
+        self.stem = stem
+        self.shared_names = []
+        self.page_files = []
+        self.page_file = None
+        self.page_transactions = 0
+        self.main_file = None
+        self.shared_file = None
+        if transactions_per_file:
+            self.shared_file = self._open(f'{stem}_shared.js')
+        else:
+            self.main_file = self._open(output_file_path)
+            self.main_file.write('import { sleep } from \'k6\';\n\n')
+
+    @staticmethod
+    def _open(file_path):
+        return open(file_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+
+    def write_shared(self, text, names=()):
+        """
+        Init-context code used by the transactions (body loader, header sets).
+        names are the exported identifiers the page modules import.
+        """
+        self.shared_names.extend(names)
+        (self.shared_file or self.main_file).write(text)
+
+    def begin_pages(self):
+        if self.main_file is not None:
+            self.main_file.write('export let PageDef = {\n\n')
+
+    def write_transaction(self, text):
+        if self.main_file is not None:
+            self.main_file.write(text)
+            return
+        if self.page_file is None or self.page_transactions >= self.transactions_per_file:
+            self._close_page_file()
+            page_number = len(self.page_files) + 1
+            page_path = f'{self.stem}_pages_{page_number}.js'
+            self.page_files.append(page_path)
+            self.page_file = self._open(page_path)
+            if self.shared_names:
+                shared_module = os.path.basename(f'{self.stem}_shared.js')
+                self.page_file.write(f"import {{ {', '.join(self.shared_names)} }} from './{shared_module}';\n\n")
+            self.page_file.write(f'export let PageDef_{page_number} = {{\n\n')
+            self.page_transactions = 0
+        self.page_file.write(text)
+        self.page_transactions += 1
+
+    def _close_page_file(self):
+        if self.page_file is not None:
+            self.page_file.write('}\n')
+            self.page_file.close()
+            self.page_file = None
+
+    def end_pages(self):
+        if self.main_file is not None:
+            self.main_file.write('}\n\n')
+            return
+        # Multi-file layout: the main script is written once all page modules exist
+        self._close_page_file()
+        self.shared_file.close()
+        self.main_file = self._open(self.output_file_path)
+        self.main_file.write('import { sleep } from \'k6\';\n')
+        for page_number, page_path in enumerate(self.page_files, 1):
+            self.main_file.write(f"import {{ PageDef_{page_number} }} from './{os.path.basename(page_path)}';\n")
+        page_defs = ', '.join(f'PageDef_{page_number}' for page_number in range(1, len(self.page_files) + 1))
+        self.main_file.write(f'\nexport let PageDef = Object.assign({{}}, {page_defs});\n\n')
+
+    def write(self, text):
+        self.main_file.write(text)
+
+    def close(self):
+        self.main_file.close()
+        return [self.output_file_path] + ([f'{self.stem}_shared.js'] + self.page_files if self.transactions_per_file else [])
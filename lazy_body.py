@@ -0,0 +1,149 @@
+import hashlib
+import json
+import mmap
+
+# Bodies that are only read when used.
+#
+# A HAR entry's response.content and request.postData are plain dicts except
+# for 'text', which can be megabytes of HTML or base64. LazyContent keeps the
+# small fields and a span (file, offset, length) for the text; the bytes are
+# read from a memory map the first time 'text' is looked up. Everything else
+# (mimeType, size, encoding, the key order) behaves like the original dict.
+# Spans point into a snapshot blob (plain UTF-8) or into the HAR itself (a
+# JSON string literal, decoded on read). Cache keys and dedup fingerprints
+# hash the stored bytes of a span (stored_form) instead of the decoded text.
+
+_maps = {}
+
+
+def _mapped(file_path):
+    mapped = _maps.get(file_path)
+    if mapped is None:
+        with open(file_path, 'rb') as mapped_file:
+            mapped = _maps[file_path] = mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return mapped
+
+
+def release(file_path):
+    # Close the map of a file about to be replaced (Windows refuses to replace a mapped file)
+    mapped = _maps.pop(file_path, None)
+    if mapped is not None:
+        mapped.close()
+
+
+def read_span(file_path, offset, length, literal=False):
+    """
+    Text stored at [offset, offset + length) of file_path, UTF-8 encoded.
+    With literal the span is a JSON string literal (quotes and escapes included).
+    """
+    if not length:
+        return ''
+    text = _mapped(file_path)[offset:offset + length].decode('utf-8')
+    return json.loads(text) if literal else text
+
+
+def span_digest(span):
+    """
+    Digest of the bytes stored at span, hashed straight from the memory map.
+    """
+    file_path, offset, length = span[:3]
+    digest = hashlib.blake2b(digest_size=16)
+    if length:
+        with memoryview(_mapped(file_path)) as view, view[offset:offset + length] as stored:
+            digest.update(stored)
+    return digest.hexdigest()
+
+
+class LazyContent(dict):
+    """
+    content / postData dict whose 'text' (or another lazy key) is read from
+    span on first access. The key is present (as None) until then, so key
+    order and membership tests do not read the body. source keeps the span
+    after the read, until the text is replaced.
+    """
+    __slots__ = ('span', 'key', 'source')
+
+    def __init__(self, fields, span, key='text', source=None):
+        dict.__init__(self, fields)
+        if span is not None:
+            dict.__setitem__(self, key, None)
+        self.span = span
+        self.key = key
+        self.source = source or span
+
+    def load(self):
+        if self.span is not None:
+            dict.__setitem__(self, self.key, read_span(*self.span))
+            self.span = None
+        return self
+
+    def __getitem__(self, key):
+        if key == self.key:
+            self.load()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key == self.key:
+            self.load()
+        return dict.get(self, key, default)
+
+    def __setitem__(self, key, value):
+        if key == self.key:
+            self.span = self.source = None
+        dict.__setitem__(self, key, value)
+
+    def pop(self, key, *default):
+        if key == self.key:
+            self.load()
+            self.source = None
+        return dict.pop(self, key, *default)
+
+    def items(self):
+        return dict.items(self.load())
+
+    def values(self):
+        return dict.values(self.load())
+
+    def copy(self):
+        return dict(self.load())
+
+    def __eq__(self, other):
+        return dict.__eq__(self.load(), other.load() if isinstance(other, LazyContent) else other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return dict.__repr__(self.load())
+
+    def __reduce__(self):
+        # Pickled (e.g. to a worker process) without reading the body
+        return LazyContent, (dict(self), self.span, self.key, self.source)
+
+
+def materialize(entry):
+    """
+    Read every lazy body of entry in place, e.g. before it is serialized.
+    """
+    request = entry.get('request') or {}
+    response = entry.get('response') or {}
+    for content in (request.get('postData'), response.get('content')):
+        if isinstance(content, LazyContent):
+            content.load()
+    return entry
+
+
+def stored_form(entry):
+    """
+    Copy of entry for hashing (cache keys, dedup fingerprints): a body backed by a
+    file is replaced by the digest of its stored bytes, so it is neither read into
+    the entry nor decoded. The digest is the same before and after the body is loaded.
+    """
+    request = entry.get('request') or {}
+    response = entry.get('response') or {}
+    stored = {**entry, 'request': dict(request), 'response': dict(response)}
+    for section, field in (('request', 'postData'), ('response', 'content')):
+        content = stored[section].get(field)
+        if isinstance(content, LazyContent) and content.source is not None:
+            stored[section][field] = {**dict(content), content.key: {'stored': span_digest(content.source)}}
+    return stored
@@ -1,20 +1,18 @@
 
 import json
 import re
+import sys
 import threading
 from flask import Flask, request, jsonify, Response
 from urllib.parse import urlparse
-
-# Load HAR file
-with open("try.har", "r", encoding="utf-8") as f:
-    har_data = json.load(f)
+from har_stream import iter_har_entries
 
 mock_responses = {}
 domain_ports = {}
 base_port = 5000  # Start assigning ports from 5000
 
-# Process HAR entries safely
-for entry in har_data["log"]["entries"]:
+# Process HAR entries safely (streamed one entry at a time; --snapshot keeps a parsed snapshot for the next start)
+for entry in iter_har_entries("try.har", snapshot="--snapshot" in sys.argv):
     request_url = entry["request"]["url"]
     parsed_url = urlparse(request_url)
     domain = parsed_url.netloc  # Extract domain
@@ -32,16 +30,9 @@ for entry in har_data["log"]["entries"]:
     except json.JSONDecodeError:
         request_data = {}
 
-    response_body = entry["response"]["content"].get("text", "").strip()
-    response_mime_type = entry["response"]["content"].get("mimeType", "application/json")
-
-    try:
-        if response_mime_type.startswith("application/json"):
-            response_data = json.loads(response_body) if response_body else {}
-        else:
-            response_data = response_body
-    except json.JSONDecodeError:
-        response_data = response_body
+    # The response body is parsed on the first matching request (see mock_response)
+    response_content = entry["response"]["content"]
+    response_mime_type = response_content.get("mimeType", "application/json")
 
     request_headers = {header["name"].lower(): True for header in entry["request"]["headers"]}
 
@@ -51,10 +42,24 @@ for entry in har_data["log"]["entries"]:
     mock_responses[port].append({
         "request_pattern": request_data,
         "headers_pattern": request_headers,
-        "response": response_data,
+        "content": response_content,
         "mime_type": response_mime_type
     })
 
+# Function to parse a recorded response on first use
+def mock_response(mock):
+    if "response" not in mock:
+        response_body = (mock["content"].get("text") or "").strip()
+        try:
+            if mock["mime_type"].startswith("application/json"):
+                response_data = json.loads(response_body) if response_body else {}
+            else:
+                response_data = response_body
+        except json.JSONDecodeError:
+            response_data = response_body
+        mock["response"] = response_data
+    return mock["response"]
+
 # Function to match request pattern
 def match_pattern(example_request, actual_request):
     for key, example_value in example_request.items():
@@ -105,7 +110,7 @@ def create_mock_server(port, responses):
                         if actual_value and actual_value != example_value:
                             difference_map[str(example_value)] = str(actual_value)
 
-                    modified_response = mock["response"]
+                    modified_response = mock_response(mock)
                     if isinstance(modified_response, dict):
                         response_text = json.dumps(modified_response)
                         for old_value, new_value in difference_map.items():
@@ -0,0 +1,59 @@
+import json
+from urllib.parse import urlparse
+
+# Route table for the HAR mock server (try.py option 3): every recorded
+# (local url, method) pair maps to the recorded response. Bodies are kept as
+# recorded (possibly still in the HAR file) and parsed on the first request.
+
+def map_domain_ports(har_entries, base_port=5000):
+    domains = set()
+    for entry in har_entries:
+        url = entry.get("request", {}).get("url", "")
+        parsed_url = urlparse(url)
+        domains.add(f"{parsed_url.scheme}://{parsed_url.netloc}")
+
+    domain_port_mapping = {}
+    for domain in sorted(domains):
+        domain_port_mapping[domain] = base_port
+        base_port += 1
+    return domain_port_mapping
+
+def local_route(url, domain_port_mapping):
+    parsed_url = urlparse(url)
+    domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+    local_url = url.replace(domain, f"http://localhost:{domain_port_mapping[domain]}")
+    return local_url.split("?")[0]
+
+def build_mock_routes(har_entries, domain_port_mapping):
+    mock_data = {}
+    for entry in har_entries:
+        request_data = entry.get("request", {})
+        response_data = entry.get("response", {})
+
+        method = request_data.get("method", "GET")
+        local_url = local_route(request_data.get("url", ""), domain_port_mapping)
+
+        mock_data[(local_url, method)] = {
+            "url": local_url,
+            "status": response_data.get("status", 200),
+            "content": response_data.get("content", {}),
+            "headers": response_data.get("headers", {}),
+        }
+    return mock_data
+
+def route_body(route):
+    """
+    (body, type) of a mock route, parsed from the recorded content on first use.
+    """
+    if "body" not in route:
+        response_body_text = route["content"].get("text") or ""
+        try:
+            response_body = json.loads(response_body_text) if response_body_text.strip().startswith("{") else response_body_text
+            response_type = "json" if isinstance(response_body, dict) else "text/html"
+        except json.JSONDecodeError:
+            print(f"Warning: Invalid JSON response for {route['url']}")
+            response_body = response_body_text
+            response_type = "text/html"
+        route["body"], route["type"] = response_body, response_type
+    return route["body"], route["type"]
@@ -0,0 +1,77 @@
+import base64
+import binascii
+import re
+from array import array
+from urllib.parse import unquote
+
+# Encoding normalization for the token index.
+#
+# A value can appear percent-encoded in a URL, JSON-escaped inside an HTML
+# page and plain in a header. Sections are decoded once before tokenizing, so
+# every occurrence is indexed under the same (decoded) value. The decoded text
+# comes with an offset map back into the raw text, so boundaries are still cut
+# from what is actually on the wire.
+
+_escape_pattern = re.compile(r'(?:%[0-9A-Fa-f]{2})+|\\u[0-9A-Fa-f]{4}|\\[\\/"]')
+_base64_pattern = re.compile(r'[A-Za-z0-9+/]{8,}={0,2}|[A-Za-z0-9\-_]{8,}={0,2}')
+# A base64 value is only replaced by its decoding if that is itself token-like
+_decoded_token_pattern = re.compile(r'[\w@:%\.\+\-\_/=]{6,}')
+
+
+def normalize_text(text):
+    """
+    Return (normalized_text, offsets). offsets[i] is the raw index of normalized
+    character i (plus one entry for the end), or None when nothing was decoded.
+    """
+    if '%' not in text and '\\' not in text:
+        return text, None
+
+    parts = []
+    offsets = array('Q')
+    raw_position = 0
+    for match in _escape_pattern.finditer(text):
+        start = match.start()
+        parts.append(text[raw_position:start])
+        offsets.extend(range(raw_position, start))
+        escape = match.group()
+        if escape[0] == '%':
+            try:
+                decoded = bytes.fromhex(escape.replace('%', '')).decode('utf-8')
+            except UnicodeDecodeError:
+                # Not UTF-8 (e.g. binary in a query string): keep the raw text
+                decoded = None
+            if decoded is None:
+                parts.append(escape)
+                offsets.extend(range(start, match.end()))
+            else:
+                parts.append(decoded)
+                position = start
+                for char in decoded:
+                    offsets.append(position)
+                    position += 3 * len(char.encode('utf-8'))
+        else:
+            parts.append(chr(int(escape[2:], 16)) if escape[1] == 'u' else escape[1])
+            offsets.append(start)
+        raw_position = match.end()
+    parts.append(text[raw_position:])
+    offsets.extend(range(raw_position, len(text) + 1))
+    return ''.join(parts), offsets
+
+
+def normalize_value(value, percent_decoded=False):
+    """
+    Normalized form of a single value: percent-decoded, and base64 that decodes
+    to a token-like string replaced by its decoding. percent_decoded values were
+    cut from normalize_text output and are not decoded a second time.
+    """
+    if '%' in value and not percent_decoded:
+        value = unquote(value)
+    if len(value) % 4 == 0 and _base64_pattern.fullmatch(value):
+        try:
+            decoded = base64.b64decode(value, altchars=b'-_' if ('-' in value or '_' in value) else None, validate=True)
+            decoded = decoded.decode('ascii')
+        except (binascii.Error, ValueError):
+            return value
+        if _decoded_token_pattern.fullmatch(decoded):
+            return decoded
+    return value
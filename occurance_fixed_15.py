@@ -1,19 +1,64 @@
 import json
 import re
 import textwrap
-from collections import defaultdict
+from collections import deque
+from contextlib import closing, contextmanager, nullcontext
+from array import array
 from termcolor import colored
 from tabulate import tabulate
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
 import threading
 import csv
 import os
+import sys
+import time
+import zlib
+import hashlib
+import sqlite3
 from urllib.parse import urlparse
-from haralyzer import HarParser
+from har_stream import HarEntries, HarWriter, dumps, iter_har_entries, iter_har_files, write_har
+from har_snapshot import SnapshotWriter
+from lazy_body import LazyContent, stored_form
+from body_class import SKIPPED_CLASSES, body_size, classify_body
+from entry_dedup import DEDUP_WINDOW, EntryDedup, Pending, entry_fingerprint
+from quick_estimate import MAX_SAMPLE, SAMPLE_PER_STRATUM, QuickEstimate, RequestValueIndex, StratifiedSample, deep_size
+from pipeline_stats import PipelineStats, peak_memory_bytes
+from body_store import BodyStore, k6_body_field, k6_body_loader
+from k6_headers import HeaderSets
+from k6_writer import K6ScriptWriter
+from dataflow import DataflowGraph
+from recording_diff import RecordingDiff, is_static
+from normalize import normalize_text, normalize_value
+from entry_filter import EntryFilter
+from url_templater import load_url_templater
 
 CONFIG_FILE = 'Config.json'
 OUTPUT_FILE = 'Generated_K6script.js'
+ANALYSIS_CACHE_FILE = 'analysis_cache.sqlite'
+ANALYSIS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Bump when analyze_transaction output changes so stale cache rows are not reused
+ANALYZER_VERSION = 5
 correlated_data  = []
+# Transaction number -> section -> correlation rows, filled once per analysis run
+correlation_index = {}
+# Where the generated k6 extractor reads a correlated value from, per section
+CORRELATION_SOURCES = {
+    'Response Header': 'response.headers',
+    'Request Header': 'response.request.headers',
+    'URL': 'response.url'
+}
+# Set to a PipelineStats to collect per-phase timings (--stats / --progress)
+pipeline_stats = None
+
+@contextmanager
+def stats_phase(name):
+    # No-op unless instrumentation is enabled
+    if pipeline_stats is None:
+        yield
+    else:
+        with pipeline_stats.phase(name):
+            yield
+
 # Function to wrap text
 def wrap_text(text, width=90):
     return "\n".join(textwrap.wrap(text, width))
@@ -25,7 +70,11 @@ def capture_boundaries(text, key_value_pair):
     if start_idx == -1:
         return "NoLeftBoundary", "NoRightBoundary"
     
-    end_idx = start_idx + len(key_value_pair)
+    return capture_boundaries_at(text, start_idx, start_idx + len(key_value_pair))
+
+def capture_boundaries_at(text, start_idx, end_idx):
+    # Boundaries around a known span (e.g. a regex match), without searching the text again
+    started = pipeline_stats.start() if pipeline_stats is not None else None
     
     # Define left boundary (10 characters before key-value)
     left_boundary = text[max(0, start_idx-10):start_idx].strip() or "NoLeftBoundary"
@@ -35,20 +84,15 @@ def capture_boundaries(text, key_value_pair):
 
     # If right boundary is still empty, find the boundary based on the next space
     if right_boundary == "NoRightBoundary":
-        remainder_text = text[end_idx:]
-        space_idx = remainder_text.find(' ')
+        space_idx = text.find(' ', end_idx)
         
         if space_idx != -1:
-            right_boundary = remainder_text[:space_idx].strip() or "NoRightBoundary"
+            right_boundary = text[end_idx:space_idx].strip() or "NoRightBoundary"
         else:
-            right_boundary = remainder_text.strip() or "NoRightBoundary"
-
-    # Validate the captured key-value pair (re-extract and compare)
-    extracted_value = f"{text[start_idx:end_idx]}"
-    
-    if extracted_value != key_value_pair:
-        return left_boundary, "NoRightBoundary"  # If the extracted value doesn't match, return default for the right boundary
+            right_boundary = text[end_idx:].strip() or "NoRightBoundary"
 
+    if started is not None:
+        pipeline_stats.stop('boundary_capture', started)
     return left_boundary, right_boundary
 
 # Function to check if a request is a GraphQL call
@@ -69,31 +113,118 @@ def is_graphql_request(entry):
 # A thread lock to ensure thread-safe updates to the shared occurrence dictionary
 occurrence_lock = threading.Lock()
 
+key_value_pattern = re.compile(r'(\b\w+\b)=([\w@:%\.\+\-\_]+)')
+form_key_pattern = re.compile(r'[\w\.\-\[\]]+')
+json_key_pattern = re.compile(r'[\w\-]+')
+json_value_pattern = re.compile(r'[\w@:%\.\+\-\_/=]+')
+json_start_pattern = re.compile(r'\s*[\[{]')
+
+# Token extractors: each yields (key, value, boundary, json_path) for one section.
+# Values are normalized (see normalize.py); boundaries are always cut from the raw text.
+
+def iter_regex_tokens(text):
+    # Plain text: key=value regex on the decoded text, boundaries come from the match span mapped back to raw offsets
+    normalized, offsets = normalize_text(text)
+    for match in key_value_pattern.finditer(normalized):
+        key, value = match.groups()
+        start_idx, end_idx = match.start(), match.end()
+        if offsets is not None:
+            start_idx, end_idx = offsets[start_idx], offsets[end_idx]
+        yield key, normalize_value(value, percent_decoded=True), capture_boundaries_at(text, start_idx, end_idx), None
+
+def iter_form_tokens(text):
+    # application/x-www-form-urlencoded: split on '&' and the first '=' while tracking offsets,
+    # then decode key and value (an encoded '&' or '=' must not split the segment)
+    start_idx = 0
+    for segment in text.split('&'):
+        end_idx = start_idx + len(segment)
+        key, separator, value = segment.partition('=')
+        if '%' in key:
+            key = normalize_value(key)
+        if separator and value and form_key_pattern.fullmatch(key):
+            yield key, normalize_value(value), capture_boundaries_at(text, start_idx, end_idx), None
+        start_idx = end_idx + 1
+
+def json_path_join(path, key):
+    # k6 response.json() selector syntax: dotted, array indexes as numbers, literal dots escaped
+    key = str(key).replace('.', '\\.')
+    return f"{path}.{key}" if path else key
+
+def iter_json_tokens(document):
+    # Walk the parsed document once; every scalar leaf becomes key=value with its JSON path
+    stack = [(document, '', None, False)]
+    while stack:
+        node, path, key, in_list = stack.pop()
+        if isinstance(node, dict):
+            for child_key, child in reversed(list(node.items())):
+                stack.append((child, json_path_join(path, child_key), child_key, False))
+        elif isinstance(node, list):
+            # List items are reported under the key of the list itself, reachable by path only
+            for i in range(len(node) - 1, -1, -1):
+                stack.append((node[i], json_path_join(path, i), key, True))
+        elif key is None or isinstance(node, bool) or not json_key_pattern.fullmatch(key):
+            continue
+        elif isinstance(node, str):
+            if json_value_pattern.fullmatch(node):
+                boundary = ("NoLeftBoundary", "NoRightBoundary") if in_list else (f'"{key}":"', '"')
+                yield key, normalize_value(node), boundary, path
+        elif isinstance(node, (int, float)):
+            boundary = ("NoLeftBoundary", "NoRightBoundary") if in_list else (f'"{key}":', "NoRightBoundary")
+            yield key, str(node), boundary, path
+
+def iter_section_tokens(data, content_type=''):
+    # Pick a tokenizer by content type; anything else falls back to the key=value regex
+    content_type = (content_type or '').lower()
+    if 'json' in content_type or json_start_pattern.match(data):
+        try:
+            document = json.loads(data)
+        except ValueError:
+            document = None
+        if isinstance(document, (dict, list)):
+            return iter_json_tokens(document)
+    if 'x-www-form-urlencoded' in content_type:
+        return iter_form_tokens(data)
+    return iter_regex_tokens(data)
+
 def analyze_transaction(entry, idx, include_response_body):
     transaction_seen_keys = set()
     results = []
 
-    def find_key_value_pairs(data, section_name):
-        key_value_pattern = re.compile(r'(\b\w+\b)=([\w@:%\.\+\-\_]+)')
-        matches = key_value_pattern.findall(data)
-        
-        for match in matches:
-            key, value = match
-
+    def find_key_value_pairs(data, section_name, content_type='', header_name=None):
+        if pipeline_stats is not None:
+            pipeline_stats.add_bytes(section_name, len(data))
+            started = pipeline_stats.start()
+        for key, value, boundary, json_path in iter_section_tokens(data, content_type):
             if len(key) > 5 or len(value) > 1:
                 key_value_str = f"{key}={value}"
                 if key_value_str in transaction_seen_keys:
                     continue
                 transaction_seen_keys.add(key_value_str)
 
-                left_boundary, right_boundary = capture_boundaries(data, key_value_str)
                 result = {
                     'key_value': key_value_str,
                     'section': section_name,
                     'transaction': idx + 1,
-                    'boundary': (left_boundary, right_boundary)
+                    'boundary': boundary,
+                    'json_path': json_path,
+                    'header_name': header_name
                 }
                 results.append(result)
+        if pipeline_stats is not None:
+            pipeline_stats.stop('token_scan', started)
+
+    def scan_body(content, section_name):
+        # Base64, binary, bundles and high-entropy text are classified out before tokenizing
+        if pipeline_stats is not None:
+            started = pipeline_stats.start()
+        body_class = classify_body(content)
+        if pipeline_stats is not None:
+            pipeline_stats.stop('classify', started)
+            pipeline_stats.count(f'body_class.{body_class}')
+            if body_class in SKIPPED_CLASSES:
+                pipeline_stats.add_skipped(body_class, body_size(content))
+        if body_class not in SKIPPED_CLASSES:
+            find_key_value_pairs(content.get('text', ''), section_name, content.get('mimeType', ''))
     
     # Check URL
     url = entry['request']['url']
@@ -101,24 +232,193 @@ def analyze_transaction(entry, idx, include_response_body):
 
     # Check request headers
     for header in entry['request']['headers']:
-        find_key_value_pairs(header['value'], 'Request Header')
+        find_key_value_pairs(header['value'], 'Request Header', header_name=header['name'])
 
     # Check request body (if present)
     if 'postData' in entry['request']:
-        request_body = entry['request']['postData'].get('text', '')
-        find_key_value_pairs(request_body, 'Request Body')
+        scan_body(entry['request']['postData'], 'Request Body')
 
     # Check response headers
     for header in entry['response']['headers']:
-        find_key_value_pairs(header['value'], 'Response Header')
+        find_key_value_pairs(header['value'], 'Response Header', header_name=header['name'])
 
     # Check response body if required
     if include_response_body and 'text' in entry['response']['content']:
-        response_body = entry['response']['content'].get('text', '')
-        find_key_value_pairs(response_body, 'Response Body')
+        scan_body(entry['response']['content'], 'Response Body')
     
     return results
 
+SECTIONS = ('URL', 'Request Header', 'Request Body', 'Response Header', 'Response Body')
+SECTION_CODES = {section: code for code, section in enumerate(SECTIONS)}
+
+class FirstOccurrence:
+    __slots__ = ('section', 'transaction', 'boundary', 'json_path', 'header_name', 'response_code')
+
+    def __init__(self, section, transaction, boundary, json_path, header_name, response_code):
+        self.section = section
+        self.transaction = transaction
+        self.boundary = boundary
+        self.json_path = json_path
+        self.header_name = header_name
+        self.response_code = response_code
+
+class OccurrenceStore:
+    """
+    Compact token occurrence map. Tokens are interned to integer ids; counts and
+    locations live in array columns (sections as SECTION_CODES), and only tokens
+    whose first non-200 occurrence was seen get a FirstOccurrence record.
+    """
+
+    def __init__(self):
+        self.token_ids = {}
+        self.tokens = []
+        self.counts = array('I')
+        self.first = []
+        self.location_tokens = array('I')
+        self.location_transactions = array('I')
+        self.location_sections = array('B')
+        # Token id -> first row in _location_order, built with it by locations()
+        self._offsets = None
+        self._location_order = None
+
+    def token_id(self, key_value_str):
+        token_id = self.token_ids.get(key_value_str)
+        if token_id is None:
+            token_id = len(self.tokens)
+            self.token_ids[key_value_str] = token_id
+            self.tokens.append(key_value_str)
+            self.counts.append(0)
+            self.first.append(None)
+        return token_id
+
+    def record(self, result, response_code):
+        token_id = self.token_id(result['key_value'])
+        self.counts[token_id] += 1
+        self.location_tokens.append(token_id)
+        self.location_transactions.append(result['transaction'])
+        self.location_sections.append(SECTION_CODES[result['section']])
+        self._location_order = None
+
+        if self.first[token_id] is None and response_code != 200:
+            self.first[token_id] = FirstOccurrence(
+                result['section'], result['transaction'], result['boundary'], result['json_path'], result['header_name'], response_code
+            )
+
+    def merge(self, other):
+        # other must hold later transactions than self to keep the first occurrence stable
+        token_map = array('I', [self.token_id(key_value_str) for key_value_str in other.tokens])
+        for other_id, token_id in enumerate(token_map):
+            self.counts[token_id] += other.counts[other_id]
+            if self.first[token_id] is None:
+                self.first[token_id] = other.first[other_id]
+        self.location_tokens.extend(array('I', [token_map[token_id] for token_id in other.location_tokens]))
+        self.location_transactions.extend(other.location_transactions)
+        self.location_sections.extend(other.location_sections)
+        self._location_order = None
+
+    def locations(self, token_id):
+        """
+        (section, transaction) pairs of a token in recording order.
+        """
+        if self._location_order is None:
+            # Counting sort of the location rows by token id, done once for all tokens
+            self._offsets = array('Q', [0]) * (len(self.tokens) + 1)
+            for position, count in enumerate(self.counts):
+                self._offsets[position + 1] = self._offsets[position] + count
+            cursor = array('Q', self._offsets)
+            self._location_order = array('Q', [0]) * len(self.location_tokens)
+            for row, location_token in enumerate(self.location_tokens):
+                self._location_order[cursor[location_token]] = row
+                cursor[location_token] += 1
+        rows = self._location_order[self._offsets[token_id]:self._offsets[token_id + 1]]
+        return [(SECTIONS[self.location_sections[row]], self.location_transactions[row]) for row in rows]
+
+def record_occurrences(occurrence_store, transaction_results, response_code):
+    for result in transaction_results:
+        occurrence_store.record(result, response_code)
+
+def analyze_chunk(chunk, include_response_body, collect_stats=False, build_store=True):
+    # Runs in a worker process: builds a partial occurrence map for a list of
+    # (idx, response_code, entry, cached_results). Entries with cached results are not scanned;
+    # the results of the scanned ones are returned too (None for cached entries) so the parent
+    # can cache them and build the dependency graph. Without build_store no map is built.
+    # With collect_stats the worker's phase timings are returned for the parent to merge.
+    global pipeline_stats
+    pipeline_stats = PipelineStats() if collect_stats else None
+    partial_store = OccurrenceStore() if build_store else None
+    fresh_results = []
+    for idx, response_code, entry, cached_results in chunk:
+        if cached_results is None:
+            transaction_results = analyze_transaction(entry, idx, include_response_body)
+            fresh_results.append(transaction_results)
+        else:
+            transaction_results = cached_results
+            fresh_results.append(None)
+        if partial_store is not None:
+            record_occurrences(partial_store, transaction_results, response_code)
+    stats_snapshot = pipeline_stats.snapshot() if collect_stats else None
+    pipeline_stats = None
+    return partial_store, fresh_results, stats_snapshot
+
+def merge_occurrence_maps(occurrence_store, partial_store):
+    # Partial maps must be merged in transaction order to keep the first occurrence stable
+    occurrence_store.merge(partial_store)
+
+class AnalysisCache:
+    """
+    On-disk cache of analyze_transaction results keyed by entry content hash and
+    analyzer settings. Least recently used rows are evicted above max_bytes.
+    """
+
+    def __init__(self, cache_path, settings, max_bytes=ANALYSIS_CACHE_MAX_BYTES):
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS results '
+            '(key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.settings = json.dumps({**settings, 'analyzer_version': ANALYZER_VERSION}, sort_keys=True)
+        self.max_bytes = max_bytes
+        self.used_at = time.time()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, entry):
+        digest = hashlib.sha256(self.settings.encode('utf-8'))
+        # Bodies still in the file are hashed from their stored bytes instead of being read
+        digest.update(dumps(stored_form(entry), sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key, idx):
+        row = self.connection.execute('SELECT data FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute('UPDATE results SET last_used = ? WHERE key = ?', (self.used_at, key))
+        # Results are stored without the transaction number, which depends on the entry position
+        return [
+            {'key_value': key_value, 'section': section, 'transaction': idx + 1, 'boundary': tuple(boundary), 'json_path': json_path, 'header_name': header_name}
+            for key_value, section, boundary, json_path, header_name in json.loads(zlib.decompress(row[0]))
+        ]
+
+    def put(self, key, transaction_results):
+        rows = [[result['key_value'], result['section'], result['boundary'], result['json_path'], result['header_name']] for result in transaction_results]
+        data = zlib.compress(json.dumps(rows, ensure_ascii=False).encode('utf-8'))
+        self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (key, data, len(data), self.used_at))
+
+    def close(self):
+        # Keep the most recently used rows that fit in max_bytes
+        kept_bytes = 0
+        evicted_keys = []
+        for key, size in self.connection.execute('SELECT key, size FROM results ORDER BY last_used DESC'):
+            kept_bytes += size
+            if kept_bytes > self.max_bytes:
+                evicted_keys.append((key,))
+        self.connection.executemany('DELETE FROM results WHERE key = ?', evicted_keys)
+        self.connection.commit()
+        self.connection.close()
+        print(f"Analysis cache: {self.hits} reused, {self.misses} analyzed, {len(evicted_keys)} evicted")
+
 # def analyze_har_for_occurrences_with_boundaries_concurrent(har_file_path, include_response_body=False):
 #     with open(har_file_path, 'r', encoding='utf-8') as f:
 #         har_data = json.load(f)
@@ -243,106 +543,341 @@ def analyze_transaction(entry, idx, include_response_body):
 #         print(colored("No correlated data found.", 'red'))
 #     return correlated_data
 # # Example usage
-def analyze_har_for_occurrences_with_boundaries_concurrent(har_file_path, include_response_body=False, mime_types=None):
-    with open(har_file_path, 'r', encoding='utf-8') as f:
-        har_data = json.load(f)
-
-    total_transactions = len(har_data['log']['entries'])
-
-    # Dictionary to store occurrences
-    occurrence_dict = defaultdict(lambda: {
-        'count': 0,
-        'locations': [],
-        'first_occurrence': {'section': None, 'transaction': None, 'boundary': None, 'response_code': None}
-    })
-
-    # Use a ThreadPoolExecutor for concurrent processing
-    with ThreadPoolExecutor() as executor:
-        futures = []
-        for idx, entry in enumerate(har_data['log']['entries']):
+def timed_entries(entries):
+    # Time spent decoding entries is reported as json_decode
+    if pipeline_stats is not None:
+        return pipeline_stats.timed_iter('json_decode', entries)
+    return entries
+
+def analyze_har_for_occurrences_with_boundaries_concurrent(har_file_path, include_response_body=False, mime_types=None, processes=None, chunk_size=256, use_cache=False,
+                                                           correlation='dataflow', dependency_graph_file=None, static_values=None, estimate=False):
+    # processes=None keeps the thread pool; an integer switches to a process pool
+    # with that many workers (0 means one per CPU), each analyzing chunk_size entries at a time.
+    # use_cache reuses per-entry results from ANALYSIS_CACHE_FILE next to the HAR file.
+    # correlation='dataflow' links request values to the response that produced them (see dataflow.py);
+    # 'occurrences' is the older count-based heuristic.
+    # With estimate, only a stratified sample is analyzed and the projected full run is returned.
+    if estimate:
+        return estimate_har_analysis(har_file_path, include_response_body, mime_types)
+    return analyze_entries_for_occurrences(
+        timed_entries(iter_har_entries(har_file_path)), include_response_body, mime_types, processes, chunk_size,
+        use_cache, cache_dir=os.path.dirname(os.path.abspath(har_file_path)),
+        correlation=correlation, dependency_graph_file=dependency_graph_file, static_values=static_values
+    )
+
+def estimate_har_analysis(har_file_path, include_response_body=False, mime_types=None, per_stratum=SAMPLE_PER_STRATUM, max_sample=MAX_SAMPLE):
+    """
+    Preview of a full analysis run: reads the HAR once, leaving long response bodies in the
+    file and tokenizing only the request side, then analyzes a sample stratified by domain,
+    MIME type and position (see quick_estimate.py). Returns the estimated correlation
+    candidates, heaviest sections and projected time and memory.
+    """
+    global pipeline_stats
+    baseline = peak_memory_bytes()
+    preview_started = time.perf_counter()
+    sample = StratifiedSample(per_stratum, max_sample)
+    request_values = RequestValueIndex()
+    entries = relevant_entries = 0
+    outer_stats = pipeline_stats
+    try:
+        pipeline_stats = None
+        for idx, entry in enumerate(iter_har_entries(har_file_path)):
+            entries += 1
+            mime_type = entry['response'].get('content', {}).get('mimeType', '')
+            if mime_types and mime_type not in mime_types:
+                continue
+            relevant_entries += 1
+            sample.add(idx, entry)
+            # Only the request side: the response is what the sample is for
+            request_view = {'request': entry['request'], 'response': {'headers': []}}
+            request_values.add(idx, analyze_transaction(request_view, idx, False))
+        estimate = QuickEstimate(entries, relevant_entries, sample.strata, time.perf_counter() - preview_started)
+
+        # Each sampled entry is analyzed with its own stats to get its bytes per section
+        dataflow_graph = DataflowGraph()
+        sampled_results = []
+        for idx, entry, key, weight in sample.sampled():
+            pipeline_stats = PipelineStats()
+            started = time.perf_counter()
+            transaction_results = analyze_transaction(entry, idx, include_response_body)
+            dataflow_graph.add_transaction(transaction_results)
+            seconds = time.perf_counter() - started
+            sampled_results.append((idx, weight, transaction_results))
+            # extract_info is what the run keeps per entry for script generation
+            estimate.add(key, weight, seconds, transaction_results, pipeline_stats.snapshot(), deep_size(extract_info(entry)))
+    finally:
+        pipeline_stats = outer_stats
+
+    graph_bytes = deep_size(dataflow_graph.producers) + deep_size(dataflow_graph.client_values)
+    edge_bytes = deep_size(dataflow_graph.edges) / len(dataflow_graph.edges) if dataflow_graph.edges else 0
+    baseline_bytes = baseline['self'] if baseline is not None else None
+    candidates = request_values.estimate_candidates(sampled_results, relevant_entries)
+    return estimate.report(candidates, graph_bytes, edge_bytes, deep_size(vars(request_values)), time.perf_counter() - preview_started, baseline_bytes)
+
+def analyze_entries_for_occurrences(entries, include_response_body=False, mime_types=None, processes=None, chunk_size=256, use_cache=False, cache_dir='.',
+                                    correlation='dataflow', dependency_graph_file=None, static_values=None, dedup=True):
+    # Same as above for any iterable of entries (e.g. the fused pipeline stream), consumed once.
+    # static_values (from diff_recordings) are dropped before correlation.
+    # With dedup, repeats of an entry reuse the results of its first occurrence (see entry_dedup.py).
+    # Only the response codes are kept per transaction; entries are streamed
+    response_codes = []
+
+    # Compact store of token occurrences, or the dependency graph built in one forward pass
+    use_dataflow = correlation == 'dataflow'
+    occurrence_store = None if use_dataflow else OccurrenceStore()
+    dataflow_graph = DataflowGraph() if use_dataflow else None
+
+    def merge_results(transaction_results):
+        with occurrence_lock, stats_phase('merge'):
+            if static_values:
+                transaction_results = [result for result in transaction_results if not is_static(result, static_values)]
+            if not transaction_results:
+                return
+            if dataflow_graph is not None:
+                dataflow_graph.add_transaction(transaction_results)
+            else:
+                response_code = response_codes[transaction_results[0]['transaction'] - 1]
+                record_occurrences(occurrence_store, transaction_results, response_code)
+
+    cache = None
+    # Closes the cache after the pool, also when analysis fails, so the sqlite file is not left locked
+    cache_scope = nullcontext()
+    if use_cache:
+        cache_path = os.path.join(cache_dir, ANALYSIS_CACHE_FILE)
+        cache = AnalysisCache(cache_path, {'include_response_body': include_response_body})
+        cache_scope = closing(cache)
+    # Process mode keeps up to max_pending + 1 chunks in flight: a repeat must outlive them in the window
+    entry_dedup = EntryDedup(max(DEDUP_WINDOW, chunk_size * (2 * (processes or os.cpu_count() or 1) + 1))) if dedup else None
+
+    def relevant_entries():
+        for idx, entry in enumerate(entries):
+            response_codes.append(entry['response']['status'])
+            if pipeline_stats is not None:
+                pipeline_stats.count('entries')
+                pipeline_stats.show_progress('analyze')
+
             # Check if MIME type is in the given list
             mime_type = entry['response'].get('content', {}).get('mimeType', '')
             if mime_types and mime_type not in mime_types:
                 continue  # Skip this entry if MIME type is not in the list
 
-            # Submit each transaction processing task to the thread pool
-            futures.append(executor.submit(analyze_transaction, entry, idx, include_response_body))
-
-        # Process each result as it completes
-        for future in as_completed(futures):
-            transaction_results = future.result()
-            with occurrence_lock:
-                for result in transaction_results:
-                    key_value_str = result['key_value']
-                    occurrence_info = occurrence_dict[key_value_str]
-                    occurrence_info['count'] += 1
-                    occurrence_info['locations'].append({
-                        'section': result['section'],
-                        'transaction': result['transaction']
-                    })
-                    
-                    if occurrence_info['first_occurrence']['section'] is None:
-                        response_code = har_data['log']['entries'][result['transaction'] - 1]['response']['status']
-                        if response_code != 200:
-                            occurrence_info['first_occurrence'] = {
-                                'section': result['section'],
-                                'transaction': result['transaction'],
-                                'boundary': result['boundary'],
-                                'response_code': response_code
-                            }
+            # Repeats of an entry seen in this run reuse its results (a Pending while it is in flight)
+            fingerprint = None
+            if entry_dedup is not None:
+                fingerprint = entry_fingerprint(entry)
+                reused_results = entry_dedup.reuse(fingerprint, idx)
+                if reused_results is not None:
+                    if pipeline_stats is not None:
+                        pipeline_stats.count('dedup.reused')
+                    yield idx, entry, None, reused_results, fingerprint
+                    continue
 
+            # Entries seen in an earlier run come back from the cache instead of being scanned
+            cache_key = cached_results = None
+            if cache is not None:
+                cache_key = cache.key(entry)
+                cached_results = cache.get(cache_key, idx)
+            yield idx, entry, cache_key, cached_results, fingerprint
+
+    def merge_chunk(item):
+        future, chunk_keys, chunk_cached, chunk_fingerprints = item
+        partial_store, fresh_results, stats_snapshot = future.result()
+        if stats_snapshot is not None:
+            pipeline_stats.merge(stats_snapshot)
+        if cache is not None:
+            for cache_key, transaction_results in zip(chunk_keys, fresh_results):
+                # Cache hits are already stored
+                if cache_key is not None and transaction_results is not None:
+                    cache.put(cache_key, transaction_results)
+        chunk_results = [
+            transaction_results if cached_results is None else cached_results
+            for transaction_results, cached_results in zip(fresh_results, chunk_cached)
+        ]
+        if entry_dedup is not None:
+            chunk_results = [entry_dedup.settle(fingerprint, transaction_results) for fingerprint, transaction_results in zip(chunk_fingerprints, chunk_results)]
+        if partial_store is None:
+            # The graph (or the filtered map) is built in the parent: it needs every transaction in recording order
+            for transaction_results in chunk_results:
+                merge_results(transaction_results)
+        else:
+            with stats_phase('merge'):
+                merge_occurrence_maps(occurrence_store, partial_store)
+
+    def merge_transaction(item):
+        result, cache_key, fingerprint = item
+        transaction_results = result.result() if isinstance(result, Future) else result
+        if cache_key is not None:
+            cache.put(cache_key, transaction_results)
+        if entry_dedup is not None:
+            transaction_results = entry_dedup.settle(fingerprint, transaction_results)
+        merge_results(transaction_results)
+
+    analyze_started = pipeline_stats.start() if pipeline_stats is not None else None
+    if processes is not None:
+        # Use a ProcessPoolExecutor: regex scanning is CPU bound and does not scale under the GIL
+        max_workers = processes or os.cpu_count() or 1
+        with cache_scope, ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # Chunks are merged in submission order, so the result does not depend on scheduling
+            max_pending = max_workers * 2
+            # Workers build partial occurrence maps unless values have to be filtered or linked first
+            build_store = occurrence_store is not None and not static_values
+            pending = deque()
+            chunk = []
+            chunk_keys = []
+            chunk_cached = []
+            chunk_fingerprints = []
+            submit_chunk = lambda: (
+                executor.submit(analyze_chunk, chunk, include_response_body, pipeline_stats is not None, build_store),
+                chunk_keys, chunk_cached, chunk_fingerprints
+            )
+            for idx, entry, cache_key, cached_results, fingerprint in relevant_entries():
+                if isinstance(cached_results, Pending) and build_store:
+                    # Workers record their own occurrences, so a repeat of an entry still in flight is scanned again
+                    cached_results = None
+                if cached_results is None:
+                    chunk.append((idx, response_codes[idx], entry, None))
+                elif isinstance(cached_results, Pending):
+                    # Resolved in the parent once the first occurrence is merged
+                    chunk.append((idx, response_codes[idx], None, []))
+                else:
+                    # Cached results travel with the chunk so merge order stays the transaction order
+                    chunk.append((idx, response_codes[idx], None, cached_results))
+                chunk_keys.append(cache_key)
+                chunk_cached.append(cached_results)
+                chunk_fingerprints.append(fingerprint)
+                if len(chunk) >= chunk_size:
+                    pending.append(submit_chunk())
+                    chunk = []
+                    chunk_keys = []
+                    chunk_cached = []
+                    chunk_fingerprints = []
+                    if len(pending) >= max_pending:
+                        merge_chunk(pending.popleft())
+            if chunk:
+                pending.append(submit_chunk())
+
+            while pending:
+                merge_chunk(pending.popleft())
+    else:
+        # Use a ThreadPoolExecutor for concurrent processing
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+        with cache_scope, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Bound the number of entries in flight so memory does not grow with the HAR size.
+            # Results are merged in transaction order, so the first occurrence is deterministic.
+            max_pending = max_workers * 4
+            pending = deque()
+            for idx, entry, cache_key, cached_results, fingerprint in relevant_entries():
+                if cached_results is not None:
+                    pending.append((cached_results, None, fingerprint))
+                else:
+                    # Submit each transaction processing task to the thread pool
+                    pending.append((executor.submit(analyze_transaction, entry, idx, include_response_body), cache_key, fingerprint))
+                if len(pending) >= max_pending:
+                    merge_transaction(pending.popleft())
+
+            # Process the remaining results
+            while pending:
+                merge_transaction(pending.popleft())
+
+    if entry_dedup is not None:
+        entry_dedup.report()
+    if analyze_started is not None:
+        pipeline_stats.stop('analyze', analyze_started)
+        pipeline_stats.show_progress('analyze', force=True)
+        pipeline_stats.end_progress()
+
+    if dataflow_graph is not None:
+        correlation_rows = dataflow_correlation_rows(dataflow_graph)
+        if dependency_graph_file:
+            dataflow_graph.write(dependency_graph_file)
+    else:
+        correlation_rows = occurrence_correlation_rows(occurrence_store, len(response_codes))
+
+    global correlated_data, correlation_index
+    correlation_rows.sort(key=format_correlation_row)
+    correlated_data = [format_correlation_row(row) for row in correlation_rows]
+    correlation_index = build_correlation_index(correlation_rows)
+
+    # Print correlated data
+    if correlated_data:
+        print("\nCorrelated Data:"+ str(len(correlated_data)))
+        for data in correlated_data:
+            print(data)
+    else:
+        print(colored("No correlated data found.", 'red'))
+    return correlated_data
+     
+
+
+def occurrence_correlation_rows(occurrence_store, total_transactions):
+    # Count-based heuristic: a token seen more than once whose first occurrence was not a 200 response
     # Prepare table for output
     table_data = []
-    global correlated_data 
-    for idx, (key_value, details) in enumerate(occurrence_dict.items(), start=1):
-        if details['count'] > 1:
-            if details['count'] == total_transactions:
+    correlation_rows = []
+    for token_id, key_value in enumerate(occurrence_store.tokens):
+        idx = token_id + 1
+        count = occurrence_store.counts[token_id]
+        if count > 1:
+            if count == total_transactions:
                 continue
 
-            first_occurrence = details['first_occurrence']
-            if not first_occurrence or first_occurrence['boundary'] is None or first_occurrence['response_code'] == 200:
+            first_occurrence = occurrence_store.first[token_id]
+            if first_occurrence is None or first_occurrence.boundary is None or first_occurrence.response_code == 200:
                 continue
 
-            transactions_str = ", ".join(map(str, [loc['transaction'] for loc in details['locations']]))
+            locations = occurrence_store.locations(token_id)
+            transactions_str = ", ".join(str(transaction) for section, transaction in locations)
 
             wrapped_key_value = wrap_text(colored(key_value, 'green'), 50)
-            wrapped_first_occurrence_section = wrap_text(colored(first_occurrence['section'], 'yellow'), 50)
-            wrapped_first_occurrence_transaction = wrap_text(colored(str(first_occurrence['transaction']), 'cyan'), 50)
+            wrapped_first_occurrence_section = wrap_text(colored(first_occurrence.section, 'yellow'), 50)
+            wrapped_first_occurrence_transaction = wrap_text(colored(str(first_occurrence.transaction), 'cyan'), 50)
             wrapped_transactions = wrap_text(colored(transactions_str, 'cyan'), 50)
 
             # Use the boundary information from the capture_boundaries function
-            left_boundary, right_boundary = first_occurrence['boundary']
+            left_boundary, right_boundary = first_occurrence.boundary
             boundary_str = f"Left: {left_boundary}, Right: {right_boundary}"
 
             table_data.append([
                 idx,
                 wrapped_first_occurrence_transaction,
                 wrapped_first_occurrence_section,
-                details['count'],
+                count,
                 wrapped_key_value,
                 wrapped_transactions,
                 boundary_str
             ])
 
             # Create correlated data
-            for location in details['locations']:
-                if details['count'] > 1:
-                    if details['count'] == total_transactions:
-                        continue
-                    first_occurrence = details['first_occurrence']
-                    if not first_occurrence or first_occurrence['boundary'] is None or first_occurrence['response_code'] == 200:
-                        continue
-                    transaction_number = location['transaction']
-                    section = location['section']
-                    left_boundary = str(first_occurrence['boundary'][0]).replace("(","\\(")
-                    right_boundary = str(first_occurrence['boundary'][1]).replace("(","\\(")
-
-                    if section == 'Response Header' and left_boundary != 'NoLeftBoundary' and right_boundary !='NoRightBoundary':
-                        correlated_data.append(f"Transaction_{transaction_number},response.headers,{left_boundary}delimiter{right_boundary}")
-                    elif section == 'Request Header' and left_boundary != 'NoLeftBoundary' and right_boundary !='NoRightBoundary':
-                        correlated_data.append(f"Transaction_{transaction_number},response.request.headers,{left_boundary}delimiter{right_boundary}")
-                    elif section == 'URL' and left_boundary != 'NoLeftBoundary' and right_boundary !='NoRightBoundary':
-                        correlated_data.append(f"Transaction_{transaction_number},response.url,{left_boundary}delimiter{right_boundary}")
+            if first_occurrence.section == 'Response Body' and first_occurrence.json_path is not None:
+                # Produced by a JSON response: read the field itself instead of regex-scanning the body
+                correlation_rows.append({
+                    'transaction': first_occurrence.transaction,
+                    'section': first_occurrence.section,
+                    'extractor': 'json',
+                    'source': 'response.json',
+                    'left': left_boundary,
+                    'right': right_boundary,
+                    'json_path': first_occurrence.json_path
+                })
+                continue
+            left_boundary = str(left_boundary).replace("(","\\(")
+            right_boundary = str(right_boundary).replace("(","\\(")
+            for section, transaction_number in locations:
+                if section in CORRELATION_SOURCES and left_boundary != 'NoLeftBoundary' and right_boundary !='NoRightBoundary':
+                    source = CORRELATION_SOURCES[section]
+                    if (section == 'Response Header' and first_occurrence.header_name
+                            and (section, transaction_number) == (first_occurrence.section, first_occurrence.transaction)):
+                        # Only scan the header the value was seen in
+                        source = f"{source}['{k6_header_name(first_occurrence.header_name)}']"
+                    correlation_rows.append({
+                        'transaction': transaction_number,
+                        'section': section,
+                        'extractor': 'regex',
+                        'source': source,
+                        'left': left_boundary,
+                        'right': right_boundary,
+                        'json_path': first_occurrence.json_path
+                    })
 
     # Print the table if data is available
     if table_data:
@@ -358,27 +893,71 @@ def analyze_har_for_occurrences_with_boundaries_concurrent(har_file_path, includ
         print("Total correlations possible: " + str(len(table_data)))
     else:
         print(colored("No key-value pairs with more than 1 occurrence found.", 'red'))
-    
-    correlated_data = sorted(correlated_data)
+    return correlation_rows
+
+def dataflow_correlation_rows(dataflow_graph):
+    # One extractor per response value that a later request actually sends
+    correlation_rows = []
+    for producer, value in dataflow_graph.used_producers():
+        left_boundary, right_boundary = producer.boundary
+        row = {
+            'transaction': producer.transaction,
+            'section': producer.section,
+            'extractor': 'boundary',
+            'left': str(left_boundary).replace("(","\\("),
+            'right': str(right_boundary).replace("(","\\("),
+            'json_path': producer.json_path
+        }
+        if producer.section == 'Response Body' and producer.json_path is not None:
+            row['extractor'] = 'json'
+            row['source'] = 'response.json'
+        elif producer.section == 'Response Header' and producer.header_name:
+            # Within a single header a missing boundary is the start or end of the value
+            row['source'] = f"response.headers['{k6_header_name(producer.header_name)}']"
+            if left_boundary == 'NoLeftBoundary':
+                row['left'] = '^'
+            if right_boundary == 'NoRightBoundary':
+                row['right'] = '$'
+        elif left_boundary != 'NoLeftBoundary' and right_boundary != 'NoRightBoundary':
+            row['source'] = 'response.body' if producer.section == 'Response Body' else CORRELATION_SOURCES[producer.section]
+        else:
+            continue
+        correlation_rows.append(row)
 
-    # Print correlated data
-    if correlated_data:
-        print("\nCorrelated Data:"+ str(len(correlated_data)))
-        for data in correlated_data:
-            print(data)
+    links = len(dataflow_graph.edges)
+    producers = len({producer.transaction for producer, value in dataflow_graph.used_producers()})
+    if links:
+        print(f"Dependency graph: {links} links from {producers} producing transactions")
     else:
-        print(colored("No correlated data found.", 'red'))
-    return correlated_data
-     
+        print(colored("No request values produced by earlier responses found.", 'red'))
+    return correlation_rows
+
+def format_correlation_row(row):
+    if row['extractor'] == 'json':
+        return f"Transaction_{row['transaction']},{row['source']},{row['json_path']}"
+    return f"Transaction_{row['transaction']},{row['source']},{row['left']}delimiter{row['right']}"
 
+def k6_header_name(header_name):
+    # k6 exposes response headers in canonical form (content-type -> Content-Type)
+    return '-'.join(part.capitalize() for part in header_name.split('-'))
+
+def js_string(text):
+    return str(text).replace('\\', '\\\\').replace("'", "\\'")
+
+def build_correlation_index(correlation_rows):
+    # Rows arrive sorted, so sections and rows keep that order inside each transaction
+    index = {}
+    for row in correlation_rows:
+        index.setdefault(row['transaction'], {}).setdefault(row['section'], []).append(row)
+    return index
 
 def get_rows_by_transaction(transaction_name):
     """
-    Function to get all rows that match a given transaction name.
+    Function to get all correlation rows of a transaction ('Transaction_N' or N).
     """
-    global correlated_data 
-    # Filter the correlated_data array for rows containing the specified transaction name
-    filtered_rows = [row for row in correlated_data if transaction_name in row]
+    transaction_number = int(str(transaction_name).replace("Transaction_", ""))
+    sections = correlation_index.get(transaction_number, {})
+    filtered_rows = [row for rows in sections.values() for row in rows]
     
     return filtered_rows
 
@@ -407,156 +986,151 @@ def extract_info(entry):
    
     url = request.get('url', '')
     method = request.get('method', '')
-    body = request.get('postData', {}).get('text', '')
+    post_data = request.get('postData', {})
     headers = request.get('headers', [])
 
-    return {'url': url, 'method': method, 'body': body, 'headers': headers}
+    if isinstance(post_data, LazyContent) and post_data.span is not None:
+        # A long body stays in the HAR until the script generator stores it
+        return LazyContent({'url': url, 'method': method, 'body': None, 'headers': headers}, post_data.span, 'body')
+    return {'url': url, 'method': method, 'body': post_data.get('text', ''), 'headers': headers}
 
 def parse_harold(har_filename):
-    with open(har_filename, 'r', encoding='utf-8') as har_file:
-        har_data = json.load(har_file)
-
-    entries = har_data.get('log', {}).get('entries', [])
-
     extracted_data = []
-    for entry in entries:
+    for entry in iter_har_entries(har_filename):
         info = extract_info(entry)
         extracted_data.append(info)
 
     return extracted_data
 
 def parse_har(har_filename):
-    try:
-        with open(har_filename, 'r', encoding='utf-8') as har_file:
-            har_data = json.load(har_file)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
-        return []
-
-    entries = har_data.get('log', {}).get('entries', [])
-
-    extracted_data = []
-    for entry in entries:
-        info = extract_info(entry)
-        extracted_data.append(info)
-
-    return extracted_data
-
-def write_body_to_file(transaction_name, body,payload_folderName):
-    filename = os.getcwd()+"\\"+payload_folderName+"\\"+f"{transaction_name}.txt"
-    filename_return="./"+payload_folderName+"/"+f"{transaction_name}.txt"
-    with open(filename, 'w', encoding='utf-8') as body_file:
-        body_file.write(body)
-    return filename_return
-
-def replace_common_domains(url, domain_mapping):
-    for common_domain, placeholder in domain_mapping.items():
-        url = url.replace(common_domain, f'${{{placeholder}}}')
-    return url
-
-def replace_specific_urls(url, specific_url_mapping):
-    for specific_url, placeholder in specific_url_mapping.items():
-        url = url.replace(specific_url, f'${{{placeholder}}}')
-    return url
-
-def convert_to_k6_script(extracted_data):
-    script = 'import { sleep } from \'k6\';\n\n'
-   
+    # Re-iterable and streamed: every pass re-reads the file one entry at a time
+    return HarEntries(har_filename, extract_info)
+
+def convert_to_k6_script(extracted_data, transactions_per_file=None, fold_polling=False, body_pack=False):
+    with stats_phase('k6_generation'):
+        _convert_to_k6_script(extracted_data, transactions_per_file, fold_polling, body_pack)
+
+def _convert_to_k6_script(extracted_data, transactions_per_file=None, fold_polling=False, body_pack=False):
+    # The script is streamed to OUTPUT_FILE section by section; with transactions_per_file
+    # the PageDef is split into modules of that many transactions (see k6_writer.py).
+    # With fold_polling, runs of identical consecutive requests that extract nothing
+    # (polling, retries) get one page that the flow repeats.
+    # With body_pack, request bodies are read from one pack through requestBody(id) (see body_store.py).
     domain_mapping = load_config()
     specific_url_mapping = {}
     current_placeholder_index = len(domain_mapping) + 1
+    # Domains and specific URLs compiled into one longest-match pass (see url_templater.py)
+    url_templater = load_url_templater(CONFIG_FILE, domain_mapping, specific_url_mapping)
 
     method_counts = {}
 
-    for i, entry in enumerate(extracted_data, 1):
-        method = entry['method']
-        method_counts[method] = method_counts.get(method, 0) + 1
-
-        script += f'export let headers_{i:02} = {{\n'
-        for header in entry['headers']:
-            # if header['name'] =="Cookie":
-            #    print(f"caps Cookie Ignored -headers_{i:02}")
-            # elif header['name']=="cookie":
-            #    print(f"small cookie Ignored -headers_{i:02}")  
-            # else:
-            script += f"  '{header['name']}': '{header['value']}',\n"
-               
-        script += '}\n\n'
-
-    script += 'export let PageDef = {\n\n'
-
-    for i, entry in enumerate(extracted_data, 1):
-        transaction_name = f'Transaction_{i}'
-
-        url_with_placeholder = replace_common_domains(entry['url'], domain_mapping)
+    # First pass: identical header sets are emitted once and shared between transactions,
+    # distinct request bodies are written once
+    header_sets = HeaderSets()
+    header_variables = []
+    body_ids = []
+    # Flow steps as [first transaction, repeat count]
+    flow_steps = []
+    previous_request = None
+    with BodyStore("Request_body_template", body_pack) as body_store:
+        for i, entry in enumerate(extracted_data, 1):
+            method = entry['method']
+            method_counts[method] = method_counts.get(method, 0) + 1
+            header_variables.append(header_sets.add(entry['headers']))
+            body_ids.append(body_store.add(entry['body']) if entry['body'] else None)
+            request = (method, entry['url'], header_variables[-1], body_ids[-1])
+            if fold_polling and request == previous_request and not get_rows_by_transaction(i) and not get_rows_by_transaction(flow_steps[-1][0]):
+                flow_steps[-1][1] += 1
+            else:
+                flow_steps.append([i, 1])
+            previous_request = request
+    total_transactions = len(header_variables)
+    folded_transactions = total_transactions - len(flow_steps)
+    if folded_transactions:
+        print(f"Folded {folded_transactions} repeated transactions into loops")
+
+    with stats_phase('script_write'):
+        writer = K6ScriptWriter(OUTPUT_FILE, transactions_per_file)
+        if body_store.pack and body_store.bodies_added:
+            writer.write_shared(k6_body_loader(body_store.folder_name), ['requestBody'])
+        writer.write_shared(header_sets.to_js(), header_sets.variables())
+
+        writer.begin_pages()
+        step_starts = {first for first, _ in flow_steps}
+        for i, entry in enumerate(extracted_data, 1):
+            if i not in step_starts:
+                continue
+            transaction_name = f'Transaction_{i}'
 
-        url_with_placeholder = replace_specific_urls(url_with_placeholder, specific_url_mapping)
+            url_with_placeholder = url_templater.template(entry['url'])
 
-        script += f"  {transaction_name}: {{\n"
-        script += f"    service: '{url_with_placeholder}',\n"
-        script += f"    headers: headers_{i:02},\n"
-        script += f"    method: '{entry['method']}',\n"
+            page = f"  {transaction_name}: {{\n"
+            page += f"    service: '{url_with_placeholder}',\n"
+            page += f"    headers: {header_variables[i - 1]},\n"
+            page += f"    method: '{entry['method']}',\n"
 
-        if entry['body']:
-           
-            body_filename = write_body_to_file(transaction_name, entry['body'],"Request_body_template")
-            script += f"    request_body_template: '{body_filename}',\n"
+            if body_ids[i - 1]:
+                page += k6_body_field(body_store, body_ids[i - 1])
 
-        script += f"    checks: [\n"
-        script += f"      {{ message: 'check {transaction_name}', validate: (response) => response.status === '200', exitOnFail: true }},\n"
-        script += f"    ],\n"
+            page += f"    checks: [\n"
+            page += f"      {{ message: 'check {transaction_name}', validate: (response) => response.status === '200', exitOnFail: true }},\n"
+            page += f"    ],\n"
 
-        
-        # print("transaction_name:"+str(transaction_name))
-        # print("convert :"+str(len(correlated_data)))
-        filtered_rows = get_rows_by_transaction(transaction_name)
-        # print("filtered_rows :"+str(len(filtered_rows)))
-        if int(len(filtered_rows)) > 1:
-            script += f"    correlate: [\n"
-            for l in range(0,int(len(filtered_rows)-1)):
-                location_to_extract=filtered_rows[l]
-                tr=str(location_to_extract).replace(",request","^^^request").replace(",response","^^^response").replace(".headers,",".headers^^^").replace(".url,",".url^^^").replace(".body,",".body^^^").replace("delimiter","^^^").replace("/","\\/")
-                fr=str(tr).split("^^^")
+            transaction_rows = get_rows_by_transaction(i)
+            # Rows of the count heuristic ('regex') keep the original rule: the last one is not emitted.
+            # Dataflow ('boundary') and JSON-path ('json') rows are real producers and are all emitted.
+            filtered_rows = [row for row in transaction_rows if row['extractor'] == 'regex']
+            extract_rows = filtered_rows[:-1] + [row for row in transaction_rows if row['extractor'] != 'regex']
+            if extract_rows:
+                page += f"    correlate: [\n"
                 trname=transaction_name.replace("Transaction_","T")
-                script += f"      {{ variable: 'C_{trname}_value_{l}', extractor: (response) => {{let x = extractAll({fr[1]},/{fr[2]}(.*?){fr[3]}/g); return x[0] }}, exitOnFail: true }},\n"
-                
-            script += f"    ],\n"
-            script += '  },\n\n'
-        else:
-            script += '  },\n\n'
-        # script += '  },\n\n'
-    # script += '  },\n\n'    
-    script += '}\n\n'
-    script += 'export let opencart_flowdef = {\n'
-    script += '  flowname: {\n'
-    script += '    thinktime: 3,\n'
-    script += '    sessionpacing: 2,\n'
-    script += '    percent: 100,\n'
-    script += '    flow: [\n'
-
-    for i, entry in enumerate(extracted_data, 1):
-        script += f"      {{ Transaction_{i}: {{ page: PageDef.Transaction_{i} }} }},\n"
-
-    script += '    ]\n'
-    script += '  }\n'
-    script += '}\n'
-
-    script += '\n// Method Counts:\n'
-    for method, count in method_counts.items():
-        script += f'// {method}: {count}\n'
+                for l, location_to_extract in enumerate(extract_rows):
+                    if location_to_extract['extractor'] == 'json':
+                        # k6 response.json(selector) returns just that field
+                        page += f"      {{ variable: 'C_{trname}_value_{l}', extractor: (response) => response.json('{js_string(location_to_extract['json_path'])}'), exitOnFail: true }},\n"
+                        continue
+                    left_boundary=location_to_extract['left'].replace("/","\\/")
+                    right_boundary=location_to_extract['right'].replace("/","\\/")
+                    page += f"      {{ variable: 'C_{trname}_value_{l}', extractor: (response) => {{let x = extractAll({location_to_extract['source']},/{left_boundary}(.*?){right_boundary}/g); return x[0] }}, exitOnFail: true }},\n"
+
+                page += f"    ],\n"
+            page += '  },\n\n'
+            writer.write_transaction(page)
+        writer.end_pages()
+
+        writer.write('export let opencart_flowdef = {\n')
+        writer.write('  flowname: {\n')
+        writer.write('    thinktime: 3,\n')
+        writer.write('    sessionpacing: 2,\n')
+        writer.write('    percent: 100,\n')
+        writer.write('    flow: [\n')
+
+        for i, repeat in flow_steps:
+            step = f"{{ Transaction_{i}: {{ page: PageDef.Transaction_{i} }} }}"
+            if repeat > 1:
+                step = f"...Array({repeat}).fill({step})"
+            writer.write(f"      {step},\n")
+
+        writer.write('    ]\n')
+        writer.write('  }\n')
+        writer.write('}\n')
+
+        writer.write('\n// Method Counts:\n')
+        for method, count in method_counts.items():
+            writer.write(f'// {method}: {count}\n')
+        writer.close()
 
     save_config(domain_mapping)
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as output_file:
-        output_file.write(script)
-
     # har_filename = 'opencart.har'
     # extracted_data = parse_har(har_filename)
 
-def main(harfilename):
+def main(harfilename, transactions_per_file=None, fold_polling=False, body_pack=False):
     har_filename = str(harfilename)
     extracted_data = parse_har(har_filename)
+    generate_k6_script(extracted_data, transactions_per_file, fold_polling, body_pack)
 
+def generate_k6_script(extracted_data, transactions_per_file=None, fold_polling=False, body_pack=False):
     unique_domains = set()
     for entry in extracted_data:
         url = entry['url']
@@ -568,72 +1142,213 @@ def main(harfilename):
 
     save_config(domain_mapping)
 
-    convert_to_k6_script(extracted_data)
+    convert_to_k6_script(extracted_data, transactions_per_file, fold_polling, body_pack)
 
 def combine_har_files(file_paths):
-    combined_entries = []
-
-    for file_path in file_paths:
-        with open(file_path, 'r', encoding='utf-8') as har_file:
-            har_data = json.load(har_file)
-            har_parser = HarParser(har_data)
-
-            # Check for different HAR structures
-            if 'log' in har_parser.har_data:
-                entries = har_parser.har_data['log']['entries']
-            elif 'entries' in har_parser.har_data:
-                entries = har_parser.har_data['entries']
-            else:
-                print(f"Invalid HAR structure in {file_path}")
-                continue
-
-            combined_entries.extend(entries)
-
-    combined_har = {"log": {"version": "1.2", "entries": combined_entries}}
+    # Entries are a lazy stream over all input files (both {"log": {"entries"}} and {"entries"} layouts)
+    combined_har = {"log": {"version": "1.2", "entries": iter_har_files(file_paths)}}
     return combined_har
 
-def save_combined_har(combined_har, output_file_path):
-    with open(output_file_path, 'w', encoding='utf-8') as output_file:
-        json.dump(combined_har, output_file, ensure_ascii=False, indent=2)
-
-def remove_domains_from_har(har_file_path, domains_to_remove, output_file_path):
-    with open(har_file_path, 'r', encoding='utf-8') as f:
-        har_data = json.load(f)
- 
-    filtered_entries = []
-    for entry in har_data['log']['entries']:
-        url = entry['request']['url']
-        if not any(domain in url for domain in domains_to_remove):
-            filtered_entries.append(entry)
- 
-    har_data['log']['entries'] = filtered_entries
- 
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        json.dump(har_data, f, ensure_ascii=False, indent=4)
+def save_combined_har(combined_har, output_file_path, indent=None):
+    # Compact unless an indent is asked for; .gz / .zst paths are compressed
+    log = combined_har['log']
+    log_fields = {key: value for key, value in log.items() if key != 'entries'}
+    write_har(log['entries'], output_file_path, log_fields, indent=indent)
+
+def _rewrite_har(har_file_path, keep_entry, output_file_path, indent=None):
+    # The input may also be the output (e.g. combined.har): write_har only replaces it once done
+    log_fields = {}
+    filtered_entries = (entry for entry in iter_har_entries(har_file_path, log_fields) if keep_entry(entry))
+    write_har(filtered_entries, output_file_path, log_fields, indent=indent)
+
+def domain_filter(domains_to_remove):
+    # Compiled keep predicate (see entry_filter.py); counts the entries each rule dropped
+    return EntryFilter(domains_to_remove)
+
+def remove_domains_from_har(har_file_path, domains_to_remove, output_file_path, indent=None):
+    keep_entry = domain_filter(domains_to_remove)
+    _rewrite_har(har_file_path, keep_entry, output_file_path, indent)
+    keep_entry.report()
  
     print(f"Domains {domains_to_remove} removed from HAR file. Updated file saved as '{output_file_path}'.")
 
-def remove_entries_with_words_from_har(har_file_path, words_to_remove, output_file_path):
+def remove_entries_with_words_from_har(har_file_path, words_to_remove, output_file_path, indent=None):
     words_list = [word.strip() for word in str(words_to_remove).split(",")]
  
-    with open(har_file_path, 'r', encoding='utf-8') as f:
-        har_data = json.load(f)
- 
-    filtered_entries = [
-        entry for entry in har_data['log']['entries']
-        if not any(word in entry['request']['url'] for word in words_list)
-    ]
- 
-    har_data['log']['entries'] = filtered_entries
- 
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        json.dump(har_data, f, ensure_ascii=False, indent=4)
+    keep_entry = EntryFilter(words_list)
+    _rewrite_har(har_file_path, keep_entry, output_file_path, indent)
+    keep_entry.report()
  
     print(f"Entries with URLs containing any of {words_list} removed from HAR file. Updated file saved as '{output_file_path}'.")
  
-
+def diff_recordings(file_names, reference_recordings, keep_entry=None):
+    """
+    Diff the recording in file_names against other recordings of the same flow and
+    return the hashes of values that are identical in all of them (see recording_diff.py).
+    """
+    recording_diff = RecordingDiff()
+    tokenize = lambda entry, idx: analyze_transaction(entry, idx, True)
+    with stats_phase('recording_diff'):
+        for recording in [file_names] + [[reference] for reference in reference_recordings]:
+            entries = iter_har_files(recording)
+            if keep_entry is not None:
+                entries = (entry for entry in entries if keep_entry(entry))
+            recording_diff.add_recording(entries, tokenize)
+        static_values = recording_diff.static_values()
+    print(f"Recording diff: {len(static_values)} static values dropped, {len(recording_diff.dynamic_values)} values differ across {recording_diff.recordings} recordings")
+    return static_values
+
+def run_pipeline(file_names, domains_to_remove=None, mime_types=None, intermediate_har=None, processes=None, use_cache=False, analyze=True,
+                 transactions_per_file=None, correlation='dataflow', dependency_graph_file=None, reference_recordings=None, indent=None,
+                 snapshot=False, fold_polling=False, body_pack=False):
+    """
+    Combine, filter, analyze and generate the k6 script from a single streamed read of the inputs.
+    The filtered entries are only written to intermediate_har when a path is given.
+    With snapshot, the inputs and intermediate_har get parsed snapshots (see har_snapshot.py)
+    on the way, so the next run over the same files skips the JSON parse.
+    With fold_polling, repeated identical requests become loops in the generated flow.
+    With body_pack, request bodies go to one pack read through requestBody(id) instead of
+    one file per distinct body named in request_body_template.
+    With reference_recordings (other recordings of the same flow) only values that differ
+    between the recordings are correlated; this reads the inputs once more.
+    """
+    extracted_data = []
+    keep_entry = domain_filter(domains_to_remove) if domains_to_remove else None
+    static_values = None
+    if analyze and reference_recordings:
+        # A filter of its own: keep_entry only counts the entries of the pipeline pass
+        diff_keep_entry = domain_filter(domains_to_remove) if domains_to_remove else None
+        static_values = diff_recordings(file_names, reference_recordings, diff_keep_entry)
+    writer = HarWriter(intermediate_har, indent=indent) if intermediate_har else None
+    snapshot_writer = SnapshotWriter(intermediate_har) if intermediate_har and snapshot else None
+
+    def pipeline_entries():
+        for entry in timed_entries(iter_har_files(file_names, snapshot)):
+            if keep_entry is not None and not keep_entry(entry):
+                continue
+            if writer is not None:
+                with stats_phase('intermediate_har_write'):
+                    writer.write(entry)
+                    if snapshot_writer is not None:
+                        snapshot_writer.write(entry)
+            # Only the fields the k6 script needs are kept for generation
+            extracted_data.append(extract_info(entry))
+            yield entry
+
+    completed = False
+    try:
+        if analyze:
+            analyze_entries_for_occurrences(
+                pipeline_entries(), include_response_body=True, mime_types=mime_types,
+                processes=processes, use_cache=use_cache, cache_dir=os.getcwd(),
+                correlation=correlation, dependency_graph_file=dependency_graph_file, static_values=static_values
+            )
+        else:
+            for _ in pipeline_entries():
+                pass
+        completed = True
+    finally:
+        if writer is not None:
+            # An interrupted run leaves an existing intermediate_har as it was
+            if completed:
+                writer.close()
+                print(f"Filtered entries saved as '{intermediate_har}'.")
+            else:
+                writer.abort()
+        if snapshot_writer is not None:
+            # The snapshot fingerprints the finished HAR, so it is closed after it
+            if completed:
+                snapshot_writer.close(writer.log_fields)
+            else:
+                snapshot_writer.abort()
+    if keep_entry is not None:
+        keep_entry.report()
+    generate_k6_script(extracted_data, transactions_per_file, fold_polling, body_pack)
+
+
+# python occurance_fixed_15.py --processes=8   (analyze with 8 worker processes, 0 = one per CPU)
+# python occurance_fixed_15.py --no-cache      (re-analyze every entry instead of reusing analysis_cache.sqlite)
+# python occurance_fixed_15.py --stats=stats.json --progress   (per-phase timings as JSON, live progress line)
+# python occurance_fixed_15.py --keep-har      (also write the filtered entries to combined.har; --keep-har=combined.har.gz compresses)
+# python occurance_fixed_15.py --indent=2      (indent written HARs; compact by default)
+# python occurance_fixed_15.py --split-script=5000   (write PageDef as modules of 5000 transactions each)
+# python occurance_fixed_15.py --dependency-graph=graph.json   (save the producer -> consumer transaction graph)
+# python occurance_fixed_15.py --legacy-correlation   (count-based correlation instead of the dependency graph)
+# python occurance_fixed_15.py --diff-recordings=run2.har,run3.har   (only correlate values that differ from other recordings of the flow)
+# python occurance_fixed_15.py --snapshot      (keep parsed snapshots next to the HARs; later runs reload them instead of parsing)
+# python occurance_fixed_15.py --fold-polling  (repeated identical requests, e.g. polling, become one page looped in the flow)
+# python occurance_fixed_15.py --body-pack     (request bodies in one pack read via requestBody(id) instead of request_body_template files)
+# python occurance_fixed_15.py --estimate=big.har   (preview: analyze a stratified sample and project the full run, then exit)
 if __name__ == "__main__":
 
+    processes = None
+    use_cache = True
+    stats_file = None
+    show_progress = False
+    intermediate_har = None
+    transactions_per_file = None
+    correlation = 'dataflow'
+    dependency_graph_file = None
+    reference_recordings = None
+    indent = None
+    snapshot = False
+    fold_polling = False
+    body_pack = False
+    estimate_files = None
+    for arg in sys.argv:
+        if arg.startswith("--processes="):
+            processes = int(arg.split("=", 1)[1])
+        elif arg == "--no-cache":
+            use_cache = False
+        elif arg.startswith("--stats="):
+            stats_file = arg.split("=", 1)[1]
+        elif arg == "--progress":
+            show_progress = True
+        elif arg == "--keep-har":
+            intermediate_har = "combined.har"
+        elif arg.startswith("--keep-har="):
+            intermediate_har = arg.split("=", 1)[1]
+        elif arg.startswith("--indent="):
+            indent = int(arg.split("=", 1)[1])
+        elif arg.startswith("--split-script="):
+            transactions_per_file = int(arg.split("=", 1)[1])
+        elif arg.startswith("--dependency-graph="):
+            dependency_graph_file = arg.split("=", 1)[1]
+        elif arg == "--legacy-correlation":
+            correlation = 'occurrences'
+        elif arg == "--snapshot":
+            snapshot = True
+        elif arg == "--fold-polling":
+            fold_polling = True
+        elif arg == "--body-pack":
+            body_pack = True
+        elif arg.startswith("--estimate="):
+            estimate_files = [file_name.strip() for file_name in arg.split("=", 1)[1].split(",")]
+        elif arg.startswith("--diff-recordings="):
+            reference_recordings = [file_name.strip() for file_name in arg.split("=", 1)[1].split(",")]
+    if stats_file or show_progress:
+        pipeline_stats = PipelineStats(progress=show_progress)
+
+    if estimate_files:
+        for file_name in estimate_files:
+            estimate = analyze_har_for_occurrences_with_boundaries_concurrent(file_name, include_response_body=True, estimate=True)
+            print(f"Estimate for '{file_name}':")
+            print(json.dumps(estimate, indent=2))
+        sys.exit(0)
+
+    def ask_mime_types():
+        # Returns None on invalid input: the script is then generated without correlation
+        mime_types = ['application/json', 'text/html','text/plain','application/x-www-form-urlencoded','text/plain;charset=UTF-8','other']
+        print(mime_types)
+        next_1=input("would you like to modify (yes/no):")
+        if next_1=="yes":
+            next_2=input("give them comma seperated (i.e) application/json,text/html:")
+            mime_types=str(next_2).split(",")
+        elif next_1!="no":
+            print("invalid input try again!")
+            return None
+        return mime_types
+
     print("Please Choose Anyone of the options")
     print("  1.Convert Whole har file to mk6.")
     print("  2.Remove Domains which is not required with domain or .extension .")
@@ -644,22 +1359,12 @@ if __name__ == "__main__":
         input_string = input("Enter har file names separated by commas: ")
         file_names = input_string.split(',')
         file_names = [file_name.strip() for file_name in file_names]
-        output_file_path = "combined.har"
-        combined_har_data = combine_har_files(file_names)
-        save_combined_har(combined_har_data, output_file_path)
         payload_folderName=create_folder("Request_body_template")
-        mime_types = ['application/json', 'text/html','text/plain','application/x-www-form-urlencoded','text/plain;charset=UTF-8','other']
-        print(mime_types)
-        next_1=input("would you like to modify (yes/no):")
-        if next_1=="yes":
-            next_2=input("give them comma seperated (i.e) application/json,text/html:")
-            mime_types=str(next_2).split(",")
-            analyze_har_for_occurrences_with_boundaries_concurrent(output_file_path, include_response_body=True,mime_types=mime_types)
-        elif next_1=="no":
-            analyze_har_for_occurrences_with_boundaries_concurrent(output_file_path, include_response_body=True,mime_types=mime_types)
-        else:
-            print("invalid input try again!")
-        main("combined.har")
+        mime_types = ask_mime_types()
+        run_pipeline(file_names, mime_types=mime_types, intermediate_har=intermediate_har,
+                     processes=processes, use_cache=use_cache, analyze=mime_types is not None,
+                     transactions_per_file=transactions_per_file, correlation=correlation, dependency_graph_file=dependency_graph_file,
+                     reference_recordings=reference_recordings, indent=indent, snapshot=snapshot, fold_polling=fold_polling, body_pack=body_pack)
     elif int(input_choose_option) == 2:
         print("  1.Domain/Extension")
         input_choose_option2 = input("Enter Option: ") 
@@ -669,28 +1374,20 @@ if __name__ == "__main__":
             input_string = input("Enter har file names separated by commas: ")
             file_names = input_string.split(',')
             file_names = [file_name.strip() for file_name in file_names]
-            output_file_path = "combined.har"
-            combined_har_data = combine_har_files(file_names)
-            save_combined_har(combined_har_data, output_file_path)
             payload_folderName=create_folder("Request_body_template")
-            remove_domains_from_har(output_file_path, DomainNameToRemove, "combined.har")
-            mime_types = ['application/json', 'text/html','text/plain','application/x-www-form-urlencoded','text/plain;charset=UTF-8','other']
-            print(mime_types)
-            next_1=input("would you like to modify (yes/no):")
-            if next_1=="yes":
-               next_2=input("give them comma seperated (i.e) application/json,text/html:")
-               mime_types=str(next_2).split(",")
-               analyze_har_for_occurrences_with_boundaries_concurrent(output_file_path, include_response_body=True,mime_types=mime_types)
-            elif next_1=="no":
-               analyze_har_for_occurrences_with_boundaries_concurrent(output_file_path, include_response_body=True,mime_types=mime_types)
-            else:
-               print("invalid input try again!")
-            main("combined.har")
+            mime_types = ask_mime_types()
+            run_pipeline(file_names, domains_to_remove=DomainNameToRemove, mime_types=mime_types, intermediate_har=intermediate_har,
+                         processes=processes, use_cache=use_cache, analyze=mime_types is not None,
+                         transactions_per_file=transactions_per_file, correlation=correlation, dependency_graph_file=dependency_graph_file,
+                         reference_recordings=reference_recordings, indent=indent, snapshot=snapshot, fold_polling=fold_polling, body_pack=body_pack)
         else:
             print("Invalid Input !")   
     else:
         print("Invalid Input !")
 
+    if stats_file:
+        pipeline_stats.write_report(stats_file)
+
 
 
 # filtered_rows = get_rows_by_transaction(transaction_name,c_correlated_data)
@@ -0,0 +1,240 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: see _windows_peak_memory_bytes
+    resource = None
+
+# Per-phase instrumentation for the HAR -> k6 pipeline.
+#
+# Hot paths call start()/stop() directly instead of the phase() context manager.
+# Every thread accumulates into its own dicts, so no lock is taken per token;
+# the dicts are only combined when the report is built.
+
+
+class PipelineStats:
+    """
+    Wall time, CPU time and call counts per phase, bytes scanned per section,
+    bytes skipped per body class, free-form counters and peak memory, reported as JSON.
+    Phases may nest (e.g. boundary_capture runs inside token_scan).
+    """
+
+    def __init__(self, progress=False, progress_interval=0.5, stream=None):
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.stream = stream or sys.stderr
+        self.started_at = time.perf_counter()
+        self.cpu_started_at = time.process_time()
+        self._local = threading.local()
+        self._registry_lock = threading.Lock()
+        self._thread_stats = []
+        self._last_progress = 0.0
+        self._progress_shown = False
+
+    def _stats(self):
+        stats = getattr(self._local, 'stats', None)
+        if stats is None:
+            stats = {'phases': {}, 'counters': {}, 'bytes_scanned': {}, 'bytes_skipped': {}}
+            self._local.stats = stats
+            with self._registry_lock:
+                self._thread_stats.append(stats)
+        return stats
+
+    def start(self):
+        return time.perf_counter(), time.thread_time()
+
+    def stop(self, name, started):
+        wall = time.perf_counter() - started[0]
+        cpu = time.thread_time() - started[1]
+        phase = self._stats()['phases'].get(name)
+        if phase is None:
+            self._stats()['phases'][name] = [wall, cpu, 1]
+        else:
+            phase[0] += wall
+            phase[1] += cpu
+            phase[2] += 1
+
+    @contextmanager
+    def phase(self, name):
+        started = self.start()
+        try:
+            yield
+        finally:
+            self.stop(name, started)
+
+    def timed_iter(self, name, iterable):
+        # Time spent producing items (e.g. JSON decoding in a streaming reader)
+        iterator = iter(iterable)
+        while True:
+            started = self.start()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.stop(name, started)
+                return
+            self.stop(name, started)
+            yield item
+
+    def count(self, name, amount=1):
+        counters = self._stats()['counters']
+        counters[name] = counters.get(name, 0) + amount
+
+    def add_bytes(self, section, amount):
+        bytes_scanned = self._stats()['bytes_scanned']
+        bytes_scanned[section] = bytes_scanned.get(section, 0) + amount
+
+    def add_skipped(self, body_class, amount):
+        bytes_skipped = self._stats()['bytes_skipped']
+        bytes_skipped[body_class] = bytes_skipped.get(body_class, 0) + amount
+
+    def snapshot(self):
+        """
+        Combined phases, counters and bytes of all threads, as plain (picklable) dicts.
+        """
+        combined = {'phases': {}, 'counters': {}, 'bytes_scanned': {}, 'bytes_skipped': {}}
+        with self._registry_lock:
+            thread_stats = list(self._thread_stats)
+        for stats in thread_stats:
+            self._merge_into(combined, stats)
+        return combined
+
+    def merge(self, snapshot):
+        # Fold in a snapshot taken in another process (e.g. a pool worker)
+        self._merge_into(self._stats(), snapshot)
+
+    @staticmethod
+    def _merge_into(target, source):
+        for name, (wall, cpu, calls) in source['phases'].items():
+            phase = target['phases'].setdefault(name, [0.0, 0.0, 0])
+            phase[0] += wall
+            phase[1] += cpu
+            phase[2] += calls
+        for key in ('counters', 'bytes_scanned', 'bytes_skipped'):
+            for name, amount in source[key].items():
+                target[key][name] = target[key].get(name, 0) + amount
+
+    def show_progress(self, label, force=False):
+        if not self.progress:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        snapshot = self.snapshot()
+        entries = snapshot['counters'].get('entries', 0)
+        elapsed = now - self.started_at
+        scanned = sum(snapshot['bytes_scanned'].values())
+        rate = entries / elapsed if elapsed else 0.0
+        self.stream.write(f"\r[{label}] {entries} entries, {rate:.1f} entries/s, {scanned / 1e6:.1f} MB scanned   ")
+        self.stream.flush()
+        self._progress_shown = True
+
+    def end_progress(self):
+        if self._progress_shown:
+            self.stream.write("\n")
+            self.stream.flush()
+            self._progress_shown = False
+
+    def report(self):
+        snapshot = self.snapshot()
+        wall = time.perf_counter() - self.started_at
+        entries = snapshot['counters'].get('entries', 0)
+        phases = {
+            name: {
+                'wall_seconds': round(phase_wall, 6),
+                'cpu_seconds': round(phase_cpu, 6),
+                'calls': calls
+            }
+            for name, (phase_wall, phase_cpu, calls) in sorted(snapshot['phases'].items())
+        }
+        # Skipped bodies are priced at this run's average token scan rate
+        scanned = sum(snapshot['bytes_scanned'].values())
+        scan_seconds = snapshot['phases'].get('token_scan', [0.0])[0]
+        seconds_per_byte = scan_seconds / scanned if scanned else 0.0
+        skipped = {
+            body_class: {
+                'bodies': snapshot['counters'].get(f'body_class.{body_class}', 0),
+                'bytes': amount,
+                'estimated_seconds_saved': round(amount * seconds_per_byte, 6)
+            }
+            for body_class, amount in sorted(snapshot['bytes_skipped'].items())
+        }
+        return {
+            'wall_seconds': round(wall, 6),
+            'cpu_seconds': round(time.process_time() - self.cpu_started_at, 6),
+            'entries': entries,
+            'entries_per_second': round(entries / wall, 1) if wall else None,
+            'phases': phases,
+            'bytes_scanned': snapshot['bytes_scanned'],
+            'skipped_bodies': skipped,
+            'counters': snapshot['counters'],
+            'peak_memory_bytes': peak_memory_bytes()
+        }
+
+    def write_report(self, report_file_path):
+        self.end_progress()
+        with open(report_file_path, 'w', encoding='utf-8') as report_file:
+            report = self.report()
+            json.dump(report, report_file, indent=2)
+        print(f"Pipeline stats saved to '{report_file_path}'.")
+        print(f"Peak memory: {format_peak_memory(report['peak_memory_bytes'])}")
+
+
+def peak_memory_bytes():
+    """
+    Peak resident memory of this process and its finished children, or None if unknown.
+    On Windows only this process's peak working set is known; 'children' is None.
+    """
+    if resource is None:
+        return _windows_peak_memory_bytes() if sys.platform == 'win32' else None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    self_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return {'self': self_peak, 'children': children_peak}
+
+
+def _windows_peak_memory_bytes():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        # PROCESS_MEMORY_COUNTERS from psapi.h
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    try:
+        get_current_process = ctypes.windll.kernel32.GetCurrentProcess
+        get_current_process.restype = wintypes.HANDLE
+        get_process_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+        get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+        get_process_memory_info.restype = wintypes.BOOL
+    except (AttributeError, OSError):
+        return None
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    if not get_process_memory_info(get_current_process(), ctypes.byref(counters), counters.cb):
+        return None
+    return {'self': counters.PeakWorkingSetSize, 'children': None}
+
+
+def format_peak_memory(peak):
+    # Human-readable peak_memory_bytes(): 'n/a' where the platform does not report it
+    if peak is None:
+        return 'n/a'
+    children = f"{peak['children'] / 1e6:.1f} MB" if peak['children'] is not None else 'n/a'
+    return f"{peak['self'] / 1e6:.1f} MB (children {children})"
@@ -0,0 +1,238 @@
+import math
+import sys
+from array import array
+from bisect import bisect_right
+from urllib.parse import urlparse
+
+from dataflow import MIN_VALUE_LENGTH, REQUEST_SECTIONS, RESPONSE_SECTIONS
+from lazy_body import LazyContent
+
+# Quick estimate of a full analysis run from a stratified sample.
+#
+# Entries are read once with long response bodies left in the file (see
+# lazy_body.py), so the pass costs little more than reading the file and
+# tokenizing the requests. Each stratum (domain, MIME type) keeps an evenly
+# spaced sample over its positions in the flow: when it holds more than
+# per_stratum entries every other one is dropped and the step doubles. Only
+# the sampled entries are analyzed; each one stands for stratum size / stratum
+# sample entries of the full run. Both the sample and the entries held while
+# reading stay bounded however many strata there are: past max_sample strata,
+# new ones share OTHER_STRATUM, and per_stratum is halved whenever the strata
+# would hold more than HELD_PER_SAMPLE * max_sample entries.
+#
+# Correlation candidates need both ends of a link, which a sample rarely has.
+# The request side (URL, headers, body) of every entry is tokenized during the
+# read pass instead, so each sampled response value can be checked against all
+# later requests. As in the dependency graph, a production counts if it is the
+# last one before the next request that sends the value; whether an unsampled
+# response re-produces it in between is estimated from how often the sample
+# produces that value.
+
+SAMPLE_PER_STRATUM = 64
+MAX_SAMPLE = 1000
+HEAVIEST_STRATA = 10
+HELD_PER_SAMPLE = 4
+OTHER_STRATUM = ('*', '*')
+
+
+def stratum_key(entry):
+    domain = urlparse(entry['request']['url']).netloc
+    mime_type = (entry['response'].get('content', {}).get('mimeType') or '').split(';')[0].strip().lower()
+    return domain, mime_type
+
+
+def deep_size(value, seen=None):
+    # Bytes held by value and everything it references, each object counted once
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, LazyContent) and value.span is not None:
+        # The body still in the file, counted at its stored length instead of being read
+        size += value.span[2]
+    if isinstance(value, dict):
+        size += sum(deep_size(key, seen) + deep_size(item, seen) for key, item in dict.items(value))
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(deep_size(item, seen) for item in value)
+    elif hasattr(value, '__slots__'):
+        size += sum(deep_size(getattr(value, name), seen) for name in value.__slots__ if hasattr(value, name))
+    return size
+
+
+class RequestValueIndex:
+    """
+    Transaction indexes at which a request sent each value, in recording order.
+    """
+
+    def __init__(self, min_value_length=MIN_VALUE_LENGTH):
+        self.min_value_length = min_value_length
+        self.requests = {}
+
+    def add(self, idx, transaction_results):
+        for result in transaction_results:
+            if result['section'] not in REQUEST_SECTIONS:
+                continue
+            value = result['key_value'].split('=', 1)[1]
+            if len(value) < self.min_value_length:
+                continue
+            requests = self.requests.get(value)
+            if requests is None:
+                self.requests[value] = array('I', [idx])
+            elif requests[-1] != idx:
+                requests.append(idx)
+
+    def estimate_candidates(self, sampled_results, relevant_entries):
+        """
+        Estimated used producers of the full run from (idx, weight, transaction_results)
+        of the sampled entries in recording order.
+        """
+        # value -> [(idx, weight)] of the sampled responses producing it
+        productions = {}
+        for idx, weight, transaction_results in sampled_results:
+            produced = set()
+            for result in transaction_results:
+                if result['section'] not in RESPONSE_SECTIONS:
+                    continue
+                value = result['key_value'].split('=', 1)[1]
+                if value in self.requests and value not in produced:
+                    produced.add(value)
+                    productions.setdefault(value, []).append((idx, weight))
+
+        candidates = 0.0
+        for value, produced_at in productions.items():
+            requests = self.requests[value]
+            # Share of all entries whose response produces the value
+            rate = min(1.0, sum(weight for _, weight in produced_at) / relevant_entries)
+            produced_first = 1.0
+            if requests[0] <= produced_at[0][0]:
+                # Unless an unsampled response produced it first, the first request makes it a client constant
+                produced_first = 1.0 - (1.0 - rate) ** requests[0]
+            for idx, weight in produced_at:
+                position = bisect_right(requests, idx)
+                if position < len(requests):
+                    # Used unless another response produces it before that request
+                    candidates += produced_first * weight * (1.0 - rate) ** (requests[position] - idx - 1)
+        return candidates
+
+
+class StratifiedSample:
+    def __init__(self, per_stratum=SAMPLE_PER_STRATUM, max_sample=MAX_SAMPLE):
+        self.per_stratum = per_stratum
+        self.max_sample = max_sample
+        # stratum key -> [entries seen, step, sampled (idx, entry)]
+        self.strata = {}
+
+    def add(self, idx, entry):
+        key = stratum_key(entry)
+        stratum = self.strata.get(key)
+        if stratum is None:
+            if len(self.strata) >= self.max_sample - 1:
+                key = OTHER_STRATUM
+                stratum = self.strata.get(key)
+            if stratum is None:
+                stratum = self.strata[key] = [0, 1, []]
+                while self.per_stratum > 1 and len(self.strata) * self.per_stratum > HELD_PER_SAMPLE * self.max_sample:
+                    self.per_stratum //= 2
+                    for other in self.strata.values():
+                        self._thin(other)
+        if stratum[0] % stratum[1] == 0:
+            stratum[2].append((idx, entry))
+            self._thin(stratum)
+        stratum[0] += 1
+
+    def _thin(self, stratum):
+        while len(stratum[2]) > self.per_stratum:
+            # Kept entries are the multiples of step: every other one keeps them evenly spaced
+            stratum[2] = stratum[2][::2]
+            stratum[1] *= 2
+
+    def sampled(self):
+        """
+        (idx, entry, stratum key, weight) in recording order, at most max_sample of them.
+        """
+        per_stratum = max(1, self.max_sample // len(self.strata)) if self.strata else 0
+        sampled = []
+        for key, (seen, _, kept) in self.strata.items():
+            if len(kept) > per_stratum:
+                kept = kept[::math.ceil(len(kept) / per_stratum)]
+            weight = seen / len(kept)
+            sampled.extend((idx, entry, key, weight) for idx, entry in kept)
+        sampled.sort(key=lambda item: item[0])
+        return sampled
+
+
+class QuickEstimate:
+    """
+    Weighted totals of the sampled entries, projected to the full run.
+    """
+
+    def __init__(self, entries, relevant_entries, strata, read_seconds):
+        self.entries = entries
+        self.relevant_entries = relevant_entries
+        self.strata = strata
+        self.read_seconds = read_seconds
+        self.sampled_entries = 0
+        self.analyze_seconds = 0.0
+        self.tokens = 0.0
+        self.retained_bytes = 0.0
+        self.section_bytes = {}
+        self.section_tokens = {}
+        self.skipped_bytes = 0.0
+        self.stratum_seconds = {}
+
+    def add(self, key, weight, seconds, transaction_results, stats_snapshot, retained_bytes):
+        self.sampled_entries += 1
+        self.analyze_seconds += seconds * weight
+        self.retained_bytes += retained_bytes * weight
+        self.tokens += len(transaction_results) * weight
+        for section, amount in stats_snapshot['bytes_scanned'].items():
+            self.section_bytes[section] = self.section_bytes.get(section, 0) + amount * weight
+        for result in transaction_results:
+            self.section_tokens[result['section']] = self.section_tokens.get(result['section'], 0) + weight
+        self.skipped_bytes += sum(stats_snapshot['bytes_skipped'].values()) * weight
+        self.stratum_seconds[key] = self.stratum_seconds.get(key, 0.0) + seconds * weight
+
+    def report(self, candidates, graph_bytes, edge_bytes, index_bytes, preview_seconds, baseline_bytes=None):
+        # graph_bytes: value index of the graph over the sample, grown to the whole flow;
+        # edge_bytes: size of one link; index_bytes: the read pass's request values, already full size
+        scale = self.relevant_entries / self.sampled_entries if self.sampled_entries else 0.0
+        sections = sorted(
+            set(self.section_bytes) | set(self.section_tokens), key=lambda section: self.section_bytes.get(section, 0), reverse=True
+        )
+        strata = sorted(self.stratum_seconds.items(), key=lambda item: item[1], reverse=True)[:HEAVIEST_STRATA]
+        # Entries left out by the MIME filter are still kept for generation
+        kept_scale = self.entries / self.relevant_entries if self.relevant_entries else 0.0
+        retained_bytes = int(self.retained_bytes * kept_scale + graph_bytes * scale + candidates * edge_bytes + index_bytes)
+        return {
+            'entries': self.entries,
+            'relevant_entries': self.relevant_entries,
+            'sampled_entries': self.sampled_entries,
+            'strata': len(self.strata),
+            'estimated_correlation_candidates': round(candidates),
+            'estimated_tokens': round(self.tokens),
+            'heaviest_sections': [
+                {
+                    'section': section,
+                    'projected_bytes': round(self.section_bytes.get(section, 0)),
+                    'projected_tokens': round(self.section_tokens.get(section, 0))
+                }
+                for section in sections
+            ],
+            'projected_skipped_body_bytes': round(self.skipped_bytes),
+            'heaviest_strata': [
+                {'domain': domain, 'mime_type': mime_type, 'entries': self.strata[(domain, mime_type)][0], 'projected_seconds': round(seconds, 3)}
+                for (domain, mime_type), seconds in strata
+            ],
+            'projected_seconds': {
+                'read': round(self.read_seconds, 3),
+                'analyze': round(self.analyze_seconds, 3),
+                'total': round(self.read_seconds + self.analyze_seconds, 3)
+            },
+            'projected_memory_bytes': {
+                'retained': retained_bytes,
+                'peak': baseline_bytes + retained_bytes if baseline_bytes is not None else None
+            },
+            'preview_seconds': round(preview_seconds, 3)
+        }
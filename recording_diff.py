@@ -0,0 +1,91 @@
+import re
+from urllib.parse import urlsplit, parse_qsl
+
+# Diff of several recordings of the same flow.
+#
+# Entries are aligned by (method, templated URL, n-th occurrence of that pair)
+# and every token is keyed by its slot, section, key and position in the slot.
+# The first recording is the reference: only hashes of its keys and values are
+# kept. A value that is identical at its aligned slot in every other recording
+# is static (build ids, versions, constants) and needs no correlation; a value
+# that differs anywhere is dynamic. Each recording is streamed once.
+
+# Path segments that identify a resource rather than a route: numbers, hex ids, long tokens (uuids too)
+_dynamic_segment = re.compile(r'\d+|[0-9a-fA-F]{8,}|[\w\-]{24,}')
+
+
+def url_template(url):
+    parts = urlsplit(url)
+    segments = ['{}' if _dynamic_segment.fullmatch(segment) else segment for segment in parts.path.split('/')]
+    query_names = sorted({name for name, value in parse_qsl(parts.query, keep_blank_values=True)})
+    return f"{parts.netloc}{'/'.join(segments)}?{'&'.join(query_names)}"
+
+
+def value_hash(value):
+    return hash(value)
+
+
+def iter_aligned_tokens(entries, tokenize):
+    """
+    Yield (token_slot_hash, value) for every token of a recording.
+    tokenize(entry, idx) returns analyze_transaction-style results.
+    """
+    slot_counts = {}
+    for idx, entry in enumerate(entries):
+        request = entry['request']
+        route = (request['method'], url_template(request['url']))
+        occurrence = slot_counts.get(route, 0)
+        slot_counts[route] = occurrence + 1
+
+        token_counts = {}
+        for result in tokenize(entry, idx):
+            key, value = result['key_value'].split('=', 1)
+            token_key = (result['section'], key)
+            position = token_counts.get(token_key, 0)
+            token_counts[token_key] = position + 1
+            yield hash((route, occurrence, token_key, position)), value
+
+
+class RecordingDiff:
+    def __init__(self):
+        self.recordings = 0
+        self.reference = {}
+        self.matches = {}
+        self.dynamic_values = set()
+
+    def add_recording(self, entries, tokenize):
+        self.recordings += 1
+        if self.recordings == 1:
+            for token_slot, value in iter_aligned_tokens(entries, tokenize):
+                self.reference[token_slot] = value_hash(value)
+            return
+
+        for token_slot, value in iter_aligned_tokens(entries, tokenize):
+            reference_value = self.reference.get(token_slot)
+            if reference_value is None:
+                # Not in the reference recording: no counterpart to compare with
+                continue
+            current_value = value_hash(value)
+            if current_value == reference_value:
+                self.matches[token_slot] = self.matches.get(token_slot, 0) + 1
+            else:
+                self.dynamic_values.add(reference_value)
+                self.dynamic_values.add(current_value)
+
+    def static_values(self):
+        """
+        Hashes of values that matched at their slot in every recording and never differed anywhere.
+        """
+        other_recordings = self.recordings - 1
+        if other_recordings < 1:
+            return set()
+        static = {
+            self.reference[token_slot]
+            for token_slot, matches in self.matches.items()
+            if matches == other_recordings
+        }
+        return static - self.dynamic_values
+
+
+def is_static(result, static_values):
+    return value_hash(result['key_value'].split('=', 1)[1]) in static_values
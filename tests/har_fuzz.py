@@ -0,0 +1,89 @@
+import json
+import random
+
+# Random HARs for the reader tests: strings mix multi-byte UTF-8, escapes,
+# quotes and fragments that look like the "text": keys the lazy reader cuts.
+FRAGMENTS = [
+    'a', 'Z', '0', ' ', '"', '\\', '/', '\n', '\t', '\r', 'é', '€', '😀', '\u0000', ' ', '퟿',
+    '=', '&', '{', '}', '[', ']', ':', ',', 'text', '"text": "', '\\"text\\":"', '\\u0041'
+]
+
+
+def random_string(rnd, max_length):
+    return ''.join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(0, max_length)))
+
+
+def random_value(rnd, depth=0):
+    kind = rnd.randrange(8 if depth < 3 else 5)
+    if kind == 0:
+        return rnd.choice([0, -1, 7, 10 ** 20, -(10 ** 20)])
+    if kind == 1:
+        return rnd.choice([0.5, -1e-7, 1e300, 3.141592653589793])
+    if kind == 2:
+        return rnd.choice([True, False, None])
+    if kind in (3, 4):
+        return random_string(rnd, 40)
+    if kind == 5:
+        return [random_value(rnd, depth + 1) for _ in range(rnd.randint(0, 4))]
+    # A "text" key outside content / postData is decoded in place, never left lazy;
+    # a key ending in an escaped quote before text must not be taken for one
+    keys = [random_string(rnd, 6) for _ in range(rnd.randint(0, 4))] + rnd.sample(['text', '"text', 'a"text'], rnd.randint(0, 2))
+    return {key: random_value(rnd, depth + 1) for key in keys}
+
+
+def random_content(rnd, mime_types):
+    content = {'mimeType': rnd.choice(mime_types), 'text': random_string(rnd, rnd.choice([0, 10, 300]))}
+    if rnd.random() < 0.3:
+        content['size'] = rnd.randint(0, 5000)
+    if rnd.random() < 0.2:
+        content['encoding'] = 'base64'
+    return content
+
+
+def random_entry(rnd):
+    entry = {
+        'request': {
+            'method': rnd.choice(['GET', 'POST']),
+            'url': f'https://{rnd.choice(["a", "b"])}.example.com/{random_string(rnd, 10)}',
+            'headers': [{'name': random_string(rnd, 5), 'value': random_string(rnd, 20)} for _ in range(rnd.randint(0, 3))]
+        },
+        'response': {'status': rnd.choice([200, 302, 404]), 'headers': [], 'content': random_content(rnd, ['text/html', 'application/json', None])}
+    }
+    if rnd.random() < 0.6:
+        entry['request']['postData'] = random_content(rnd, ['application/x-www-form-urlencoded', 'text/plain'])
+    if rnd.random() < 0.3:
+        entry['_extra'] = random_value(rnd)
+    return entry
+
+
+def random_har(rnd):
+    entries = [random_entry(rnd) for _ in range(rnd.randint(0, 12))]
+    if rnd.random() < 0.2:
+        # Bare layout some tools write
+        return {'entries': entries}
+    log = {'version': '1.2', 'creator': {'name': random_string(rnd, 8)}}
+    if rnd.random() < 0.5:
+        log['pages'] = [{'id': random_string(rnd, 5)}]
+    log['entries'] = entries
+    if rnd.random() < 0.5:
+        log['comment'] = random_string(rnd, 10)
+    return {'log': log}
+
+
+def dump_har(rnd, har, har_file):
+    # Compact, indented, ASCII-escaped or raw UTF-8, as different recorders write them
+    json.dump(har, har_file, ensure_ascii=rnd.random() < 0.5, indent=rnd.choice([None, 0, 1, 4]))
+
+
+def expected_entries(har):
+    return har['log']['entries'] if 'log' in har else har['entries']
+
+
+def expected_log_fields(har):
+    # Only the log fields before the entries array are collected
+    fields = {}
+    for key, value in har.get('log', {}).items():
+        if key == 'entries':
+            break
+        fields[key] = value
+    return fields
@@ -0,0 +1,47 @@
+import pytest
+
+from entry_filter import EntryFilter
+from har_stream import iter_har_entries, write_har
+
+
+def make_entry(url, status=200, mime_type='text/html'):
+    return {
+        'request': {'method': 'GET', 'url': url, 'headers': []},
+        'response': {'status': status, 'headers': [], 'content': {'mimeType': mime_type, 'text': ''}}
+    }
+
+
+def test_dotted_rules_match_hosts_and_file_names():
+    keep_entry = EntryFilter(['.min.js', 'jquery.min.js', 'gtm.js', 'cdn.example.com'])
+    assert keep_entry.match(make_entry('https://cdn.x/lib/jquery.min.js')) == 'jquery.min.js'
+    assert keep_entry.match(make_entry('https://cdn.x/lib/app.min.js?v=2')) == '.min.js'
+    assert keep_entry.match(make_entry('https://www.googletagmanager.com/gtm.js?id=GTM-1')) == 'gtm.js'
+    assert keep_entry.match(make_entry('https://a.cdn.example.com/app')) == 'cdn.example.com'
+    assert keep_entry.match(make_entry('https://api.x/app.js')) is None
+
+
+def test_invalid_status_rules_are_reported_and_ignored(capsys):
+    keep_entry = EntryFilter(['status:abc', 'status:2xx', 'status:4xx', 'status:404', 're:('])
+    assert keep_entry.rules == ['status:2xx', 'status:4xx', 'status:404']
+    assert "Ignoring filter rule 'status:abc'" in capsys.readouterr().out
+    assert keep_entry.match(make_entry('https://x/a', status=201)) == 'status:2xx'
+    assert keep_entry.match(make_entry('https://x/a', status=404)) == 'status:404'
+    assert keep_entry.match(make_entry('https://x/a', status=302)) is None
+
+
+def test_null_mime_type():
+    keep_entry = EntryFilter(['mime:image/'])
+    assert keep_entry.match(make_entry('https://x/a', mime_type=None)) is None
+    assert keep_entry.match(make_entry('https://x/a.png', mime_type='image/png')) == 'mime:image/'
+
+
+def test_remove_domains_from_har_drops_file_name_rules(tmp_path):
+    pytest.importorskip('termcolor')
+    pytest.importorskip('tabulate')
+    from occurance_fixed_15 import remove_domains_from_har
+
+    input_path = str(tmp_path / 'in.har')
+    output_path = str(tmp_path / 'out.har')
+    write_har([make_entry('https://cdn.x/lib/jquery.min.js'), make_entry('https://api.x/data')], input_path)
+    remove_domains_from_har(input_path, ['.min.js'], output_path)
+    assert [entry['request']['url'] for entry in iter_har_entries(output_path)] == ['https://api.x/data']
@@ -0,0 +1,32 @@
+import gzip
+import random
+
+import pytest
+
+import har_stream
+from har_fuzz import dump_har, expected_entries, expected_log_fields, random_har
+from har_stream import iter_har_entries, write_har
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_streaming_reader_matches_json_load(tmp_path, monkeypatch, seed):
+    # gzip goes through the plain raw_decode reader; tiny reads split tokens, escapes and UTF-8 sequences
+    rnd = random.Random(seed)
+    monkeypatch.setattr(har_stream, 'CHUNK_SIZE', rnd.choice([1, 2, 3, 7, 64, 4096]))
+    har = random_har(rnd)
+    har_path = str(tmp_path / 'in.har.gz')
+    with gzip.open(har_path, 'wt', encoding='utf-8') as har_file:
+        dump_har(rnd, har, har_file)
+
+    log_fields = {}
+    assert list(iter_har_entries(har_path, log_fields)) == expected_entries(har)
+    assert log_fields == expected_log_fields(har)
+
+
+def test_write_har_round_trip(tmp_path):
+    rnd = random.Random(1)
+    entries = expected_entries(random_har(rnd))
+    for name in ('out.har', 'out.har.gz'):
+        har_path = str(tmp_path / name)
+        write_har(entries, har_path, {'version': '1.2'})
+        assert list(iter_har_entries(har_path)) == entries
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+import har_stream
+from har_fuzz import dump_har, expected_entries, expected_log_fields, random_har
+from har_stream import iter_har_entries
+from lazy_body import LazyContent, materialize, release
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_lazy_reader_matches_json_load(tmp_path, monkeypatch, seed):
+    # Uncompressed HARs go through _LazyBodyStream, which cuts body literals out of the bytes
+    rnd = random.Random(seed)
+    monkeypatch.setattr(har_stream, 'CHUNK_SIZE', rnd.choice([1, 2, 3, 7, 64, 4096]))
+    monkeypatch.setattr(har_stream, 'LAZY_BODY_MIN_BYTES', rnd.choice([1, 8, 32, 128]))
+    har = random_har(rnd)
+    har_path = str(tmp_path / 'in.har')
+    with open(har_path, 'w', encoding='utf-8', newline='') as har_file:
+        dump_har(rnd, har, har_file)
+
+    log_fields = {}
+    try:
+        entries = list(iter_har_entries(har_path, log_fields))
+        lazy = sum(
+            isinstance(content, LazyContent) and content.span is not None
+            for entry in entries for content in (entry['request'].get('postData'), entry['response']['content'])
+        )
+        assert [materialize(entry) for entry in entries] == expected_entries(har)
+        assert log_fields == expected_log_fields(har)
+    finally:
+        release(str(tmp_path / 'in.har'))
+    # Bodies are only read when used: each cut one was still in the file before materialize
+    if har_stream.LAZY_BODY_MIN_BYTES == 1:
+        assert lazy == sum(
+            content is not None
+            for entry in expected_entries(har) for content in (entry['request'].get('postData'), entry['response']['content'])
+        )
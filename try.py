@@ -1,7 +1,14 @@
 import json
 import os
 from urllib.parse import urlparse
-from haralyzer import HarParser
+from har_stream import HarEntries, iter_har_entries, iter_har_files, write_har
+from lazy_body import LazyContent
+from mock_routes import map_domain_ports, build_mock_routes, route_body
+from body_store import BodyStore, k6_body_field, k6_body_loader
+from k6_headers import HeaderSets
+from k6_writer import K6ScriptWriter
+from entry_filter import EntryFilter
+from url_templater import load_url_templater
 import threading
 import sys
 import subprocess
@@ -42,138 +49,104 @@ def extract_info(entry):
    
     url = request.get('url', '')
     method = request.get('method', '')
-    body = request.get('postData', {}).get('text', '')
+    post_data = request.get('postData', {})
     headers = request.get('headers', [])
 
-    return {'url': url, 'method': method, 'body': body, 'headers': headers}
+    if isinstance(post_data, LazyContent) and post_data.span is not None:
+        # A long body stays in the HAR until the script generator stores it
+        return LazyContent({'url': url, 'method': method, 'body': None, 'headers': headers}, post_data.span, 'body')
+    return {'url': url, 'method': method, 'body': post_data.get('text', ''), 'headers': headers}
 
 def parse_harold(har_filename):
-    with open(har_filename, 'r', encoding='utf-8') as har_file:
-        har_data = json.load(har_file)
-
-    entries = har_data.get('log', {}).get('entries', [])
-
     extracted_data = []
-    for entry in entries:
+    for entry in iter_har_entries(har_filename):
         info = extract_info(entry)
         extracted_data.append(info)
 
     return extracted_data
 
-def parse_har(har_filename):
-    try:
-        with open(har_filename, 'r', encoding='utf-8') as har_file:
-            har_data = json.load(har_file)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
-        return []
-
-    entries = har_data.get('log', {}).get('entries', [])
-
-    extracted_data = []
-    for entry in entries:
-        info = extract_info(entry)
-        extracted_data.append(info)
-
-    return extracted_data
+def parse_har(har_filename, snapshot=False):
+    # Re-iterable and streamed: every pass re-reads the file one entry at a time
+    return HarEntries(har_filename, extract_info, snapshot)
 
-def write_body_to_file(transaction_name, body,payload_folderName):
-    filename = os.getcwd()+"\\"+payload_folderName+"\\"+f"{transaction_name}.txt"
-    filename_return="./"+payload_folderName+"/"+f"{transaction_name}.txt"
-    with open(filename, 'w', encoding='utf-8') as body_file:
-        body_file.write(body)
-    return filename_return
-
-def replace_common_domains(url, domain_mapping):
-    for common_domain, placeholder in domain_mapping.items():
-        url = url.replace(common_domain, f'${{{placeholder}}}')
-    return url
-
-def replace_specific_urls(url, specific_url_mapping):
-    for specific_url, placeholder in specific_url_mapping.items():
-        url = url.replace(specific_url, f'${{{placeholder}}}')
-    return url
-
-def convert_to_k6_script(extracted_data):
-    script = 'import { sleep } from \'k6\';\n\n'
-   
+def convert_to_k6_script(extracted_data, transactions_per_file=None, body_pack=False):
+    # The script is streamed to OUTPUT_FILE section by section (see k6_writer.py)
+    # With body_pack, request bodies are read from one pack through requestBody(id) (see body_store.py)
     domain_mapping = load_config()
     specific_url_mapping = {}
     current_placeholder_index = len(domain_mapping) + 1
+    # Domains and specific URLs compiled into one longest-match pass (see url_templater.py)
+    url_templater = load_url_templater(CONFIG_FILE, domain_mapping, specific_url_mapping)
 
     method_counts = {}
 
-    for i, entry in enumerate(extracted_data, 1):
-        method = entry['method']
-        method_counts[method] = method_counts.get(method, 0) + 1
-
-        script += f'export let headers_{i:02} = {{\n'
-        for header in entry['headers']:
-            # if header['name'] =="Cookie":
-            #    print(f"caps Cookie Ignored -headers_{i:02}")
-            # elif header['name']=="cookie":
-            #    print(f"small cookie Ignored -headers_{i:02}")  
-            # else:
-            script += f"  '{header['name']}': '{header['value']}',\n"
-               
-        script += '}\n\n'
-
-    script += 'export let PageDef = {\n\n'
-
+    # First pass: identical header sets are emitted once and shared between transactions,
+    # distinct request bodies are written once
+    header_sets = HeaderSets()
+    header_variables = []
+    body_ids = []
+    with BodyStore("Request_body_template", body_pack) as body_store:
+        for i, entry in enumerate(extracted_data, 1):
+            method = entry['method']
+            method_counts[method] = method_counts.get(method, 0) + 1
+            header_variables.append(header_sets.add(entry['headers']))
+            body_ids.append(body_store.add(entry['body']) if entry['body'] else None)
+    total_transactions = len(header_variables)
+
+    writer = K6ScriptWriter(OUTPUT_FILE, transactions_per_file)
+    if body_store.pack and body_store.bodies_added:
+        writer.write_shared(k6_body_loader(body_store.folder_name), ['requestBody'])
+    writer.write_shared(header_sets.to_js(), header_sets.variables())
+
+    writer.begin_pages()
     for i, entry in enumerate(extracted_data, 1):
         transaction_name = f'Transaction_{i}'
 
-        url_with_placeholder = replace_common_domains(entry['url'], domain_mapping)
-
-        url_with_placeholder = replace_specific_urls(url_with_placeholder, specific_url_mapping)
-
-        script += f"  {transaction_name}: {{\n"
-        script += f"    service: '{url_with_placeholder}',\n"
-        script += f"    headers: headers_{i:02},\n"
-        script += f"    method: '{entry['method']}',\n"
+        url_with_placeholder = url_templater.template(entry['url'])
 
-        if entry['body']:
-           
-            body_filename = write_body_to_file(transaction_name, entry['body'],"Request_body_template")
-            script += f"    request_body_template: '{body_filename}',\n"
+        page = f"  {transaction_name}: {{\n"
+        page += f"    service: '{url_with_placeholder}',\n"
+        page += f"    headers: {header_variables[i - 1]},\n"
+        page += f"    method: '{entry['method']}',\n"
 
-        script += f"    checks: [\n"
-        script += f"      {{ message: 'check {transaction_name}', validate: (response) => response.status === '200', exitOnFail: true }},\n"
-        script += f"    ],\n"
+        if body_ids[i - 1]:
+            page += k6_body_field(body_store, body_ids[i - 1])
 
-        script += '  },\n\n'
+        page += f"    checks: [\n"
+        page += f"      {{ message: 'check {transaction_name}', validate: (response) => response.status === '200', exitOnFail: true }},\n"
+        page += f"    ],\n"
 
-    script += '}\n\n'
+        page += '  },\n\n'
+        writer.write_transaction(page)
+    writer.end_pages()
 
-    script += 'export let opencart_flowdef = {\n'
-    script += '  flowname: {\n'
-    script += '    thinktime: 3,\n'
-    script += '    sessionpacing: 2,\n'
-    script += '    percent: 100,\n'
-    script += '    flow: [\n'
+    writer.write('export let opencart_flowdef = {\n')
+    writer.write('  flowname: {\n')
+    writer.write('    thinktime: 3,\n')
+    writer.write('    sessionpacing: 2,\n')
+    writer.write('    percent: 100,\n')
+    writer.write('    flow: [\n')
 
-    for i, entry in enumerate(extracted_data, 1):
-        script += f"      {{ Transaction_{i}: {{ page: PageDef.Transaction_{i} }} }},\n"
+    for i in range(1, total_transactions + 1):
+        writer.write(f"      {{ Transaction_{i}: {{ page: PageDef.Transaction_{i} }} }},\n")
 
-    script += '    ]\n'
-    script += '  }\n'
-    script += '}\n'
+    writer.write('    ]\n')
+    writer.write('  }\n')
+    writer.write('}\n')
 
-    script += '\n// Method Counts:\n'
+    writer.write('\n// Method Counts:\n')
     for method, count in method_counts.items():
-        script += f'// {method}: {count}\n'
+        writer.write(f'// {method}: {count}\n')
+    writer.close()
 
     save_config(domain_mapping)
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as output_file:
-        output_file.write(script)
-
     # har_filename = 'opencart.har'
     # extracted_data = parse_har(har_filename)
 
-def main(harfilename):
+def main(harfilename, snapshot=False, body_pack=False):
     har_filename = str(harfilename)
-    extracted_data = parse_har(har_filename)
+    extracted_data = parse_har(har_filename, snapshot)
 
     unique_domains = set()
     for entry in extracted_data:
@@ -186,66 +159,38 @@ def main(harfilename):
 
     save_config(domain_mapping)
 
-    convert_to_k6_script(extracted_data)
+    convert_to_k6_script(extracted_data, body_pack=body_pack)
 
 def combine_har_files(file_paths):
-    combined_entries = []
-
-    for file_path in file_paths:
-        with open(file_path, 'r', encoding='utf-8') as har_file:
-            har_data = json.load(har_file)
-            har_parser = HarParser(har_data)
-
-            # Check for different HAR structures
-            if 'log' in har_parser.har_data:
-                entries = har_parser.har_data['log']['entries']
-            elif 'entries' in har_parser.har_data:
-                entries = har_parser.har_data['entries']
-            else:
-                print(f"Invalid HAR structure in {file_path}")
-                continue
-
-            combined_entries.extend(entries)
-
-    combined_har = {"log": {"version": "1.2", "entries": combined_entries}}
+    # Entries are a lazy stream over all input files (both {"log": {"entries"}} and {"entries"} layouts)
+    combined_har = {"log": {"version": "1.2", "entries": iter_har_files(file_paths)}}
     return combined_har
 
-def save_combined_har(combined_har, output_file_path):
-    with open(output_file_path, 'w', encoding='utf-8') as output_file:
-        json.dump(combined_har, output_file, ensure_ascii=False, indent=2)
-
-def remove_domains_from_har(har_file_path, domains_to_remove, output_file_path):
-    with open(har_file_path, 'r', encoding='utf-8') as f:
-        har_data = json.load(f)
- 
-    filtered_entries = []
-    for entry in har_data['log']['entries']:
-        url = entry['request']['url']
-        if not any(domain in url for domain in domains_to_remove):
-            filtered_entries.append(entry)
- 
-    har_data['log']['entries'] = filtered_entries
- 
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        json.dump(har_data, f, ensure_ascii=False, indent=4)
+def save_combined_har(combined_har, output_file_path, indent=None):
+    # Compact unless an indent is asked for; .gz / .zst paths are compressed
+    log = combined_har['log']
+    log_fields = {key: value for key, value in log.items() if key != 'entries'}
+    write_har(log['entries'], output_file_path, log_fields, indent=indent)
+
+def _rewrite_har(har_file_path, keep_entry, output_file_path, indent=None):
+    # The input may also be the output: write_har only replaces it once done
+    log_fields = {}
+    filtered_entries = (entry for entry in iter_har_entries(har_file_path, log_fields) if keep_entry(entry))
+    write_har(filtered_entries, output_file_path, log_fields, indent=indent)
+
+def remove_domains_from_har(har_file_path, domains_to_remove, output_file_path, indent=None):
+    keep_entry = EntryFilter(domains_to_remove)
+    _rewrite_har(har_file_path, keep_entry, output_file_path, indent)
+    keep_entry.report()
  
     print(f"Domains {domains_to_remove} removed from HAR file. Updated file saved as '{output_file_path}'.")
 
-def remove_entries_with_words_from_har(har_file_path, words_to_remove, output_file_path):
+def remove_entries_with_words_from_har(har_file_path, words_to_remove, output_file_path, indent=None):
     words_list = [word.strip() for word in str(words_to_remove).split(",")]
  
-    with open(har_file_path, 'r', encoding='utf-8') as f:
-        har_data = json.load(f)
- 
-    filtered_entries = [
-        entry for entry in har_data['log']['entries']
-        if not any(word in entry['request']['url'] for word in words_list)
-    ]
- 
-    har_data['log']['entries'] = filtered_entries
- 
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        json.dump(har_data, f, ensure_ascii=False, indent=4)
+    keep_entry = EntryFilter(words_list)
+    _rewrite_har(har_file_path, keep_entry, output_file_path, indent)
+    keep_entry.report()
  
     print(f"Entries with URLs containing any of {words_list} removed from HAR file. Updated file saved as '{output_file_path}'.")
 
@@ -316,8 +261,7 @@ def create_mock_server(port, cert_key, cert_crt):
         response = mock_data.get((url_path, method))
 
         if response:
-            response_body = response["body"]
-            response_type = response["type"]
+            response_body, response_type = route_body(response)
             expected_headers = response["headers"]
 
             if headers_validation:
@@ -355,8 +299,13 @@ def create_mock_server(port, cert_key, cert_crt):
 
 
 # python mockactualssl.py  --https=false --headers-validation=false
+# python try.py --snapshot   (keep a parsed snapshot next to the HAR; later runs reload it instead of parsing)
+# python try.py --body-pack  (request bodies in one pack read via requestBody(id) instead of request_body_template files)
 if __name__ == "__main__":
 
+    snapshot = "--snapshot" in sys.argv
+    body_pack = "--body-pack" in sys.argv
+
     print("Please Choose Anyone of the options")
     print("  1.Convert Whole har file to mk6.")
     print("  2.Remove Domains which is not required with domain or .extension .")
@@ -370,7 +319,7 @@ if __name__ == "__main__":
         combined_har_data = combine_har_files(file_names)
         save_combined_har(combined_har_data, output_file_path)
         payload_folderName=create_folder("Request_body_template")
-        main(output_file_path)
+        main(output_file_path, snapshot, body_pack)
     elif int(input_choose_option) == 2:
         print("  1.Domain/Extension")
         input_choose_option2 = input("Enter Option: ") 
@@ -385,20 +334,20 @@ if __name__ == "__main__":
             save_combined_har(combined_har_data, output_file_path)
             payload_folderName=create_folder("Request_body_template")
             remove_domains_from_har(output_file_path, DomainNameToRemove, "Customized.har")
-            main("Customized.har")
+            main("Customized.har", snapshot, body_pack)
         else:
             print("Invalid Input !")
     elif int(input_choose_option)==3:
         required_modules = ["flask", "pywin32", "win32crypt"]
         # for module in required_modules:
             # check_and_install(module)
-        try:
-            input_choose_option5 = input("Enter harfile name: ")
-            with open(str(input_choose_option5), "r", encoding="utf-8") as f:
-                har_data = json.load(f)
-        except Exception as e:
-            print(f"Error loading HAR file: {e}")
-            har_data = {"log": {"entries": []}}
+        input_choose_option5 = input("Enter harfile name: ")
+        if os.path.exists(str(input_choose_option5)):
+            # Streamed twice (domains, then mock data) instead of holding the parsed HAR
+            har_entries = HarEntries(str(input_choose_option5), snapshot=snapshot)
+        else:
+            print(f"Error loading HAR file: {input_choose_option5} not found")
+            har_entries = []
         headers_validation = False 
         https_enabled = False
         for arg in sys.argv:
@@ -408,25 +357,7 @@ if __name__ == "__main__":
                 https_enabled = False
             elif arg == "--https=true":
                 https_enabled = True
-        domains = set()
-        mock_data = {}
-
-        for entry in har_data["log"]["entries"]:
-            request_data = entry.get("request", {})
-            response_data = entry.get("response", {})
-
-            url = request_data.get("url", "")
-            method = request_data.get("method", "GET")
-
-            parsed_url = urlparse(url)
-            domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            domains.add(domain)
-        domain_port_mapping = {}
-        base_port = 5000
-
-        for domain in sorted(domains):
-            domain_port_mapping[domain] = base_port
-            base_port += 1
+        domain_port_mapping = map_domain_ports(har_entries)
         print("\n🔹 Mocked Domains with Ports:")
         for domain, port in domain_port_mapping.items():
             print(f"  {domain} → localhost:{port}")        
@@ -437,35 +368,7 @@ if __name__ == "__main__":
         else:
             print("HTTPS is disabled. Skipping certificate generation.")
 
-        for entry in har_data["log"]["entries"]:
-            request_data = entry.get("request", {})
-            response_data = entry.get("response", {})
-
-            url = request_data.get("url", "")
-            method = request_data.get("method", "GET")
-
-            parsed_url = urlparse(url)
-            domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            
-            local_url = url.replace(domain, f"http://localhost:{domain_port_mapping[domain]}")
-            local_url = local_url.split("?")[0] 
-
-            response_body_text = response_data.get("content", {}).get("text", "")
-
-            try:
-                response_body = json.loads(response_body_text) if response_body_text.strip().startswith("{") else response_body_text
-                response_type = "json" if isinstance(response_body, dict) else "text/html"
-            except json.JSONDecodeError:
-                print(f"Warning: Invalid JSON response for {local_url}")
-                response_body = response_body_text
-                response_type = "text/html"
-
-            mock_data[(local_url, method)] = {
-                "status": response_data.get("status", 200),
-                "body": response_body,
-                "type": response_type,
-                "headers": response_data.get("headers", {}),
-            }
+        mock_data = build_mock_routes(har_entries, domain_port_mapping)
         for domain, port in domain_port_mapping.items():
             threading.Thread(target=create_mock_server, args=(port, cert_key, cert_crt), daemon=True).start()
             input("\n✅ Servers are running. Press Enter to stop...\n")   
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import re
+
+# URL templating for the generated k6 script.
+#
+# Config.json maps placeholders to domains ({"BASE_URL_1": "shop.example.com"}).
+# All domains and specific URLs are compiled into one regex alternation, longest
+# first, so every URL is templated in a single left-to-right pass and overlapping
+# mappings always resolve to the longest match. Domains only match whole host
+# names in the authority part. The prepared pattern is cached next to
+# Config.json and reused while the mappings are unchanged.
+
+CACHE_SUFFIX = '.templater'
+
+_templaters = {}
+
+
+class UrlTemplater:
+    def __init__(self, pattern_source, placeholders):
+        self.pattern_source = pattern_source
+        self.placeholders = placeholders
+        self.pattern = re.compile(pattern_source) if pattern_source else None
+
+    @classmethod
+    def build(cls, domain_mapping, specific_url_mapping=None):
+        """
+        domain_mapping is placeholder -> domain (as stored in Config.json),
+        specific_url_mapping is url -> placeholder.
+        """
+        placeholders = {domain: placeholder for placeholder, domain in domain_mapping.items() if domain}
+        placeholders.update({url: placeholder for url, placeholder in (specific_url_mapping or {}).items() if url})
+        specific_urls = set(specific_url_mapping or {})
+        alternatives = []
+        for text in sorted(placeholders, key=lambda text: (-len(text), text)):
+            if text in specific_urls:
+                alternatives.append(re.escape(text))
+            else:
+                # Whole host names right after '//': a.com must not match inside data.com or in a path
+                alternatives.append(r'(?<=//)' + re.escape(text) + r'(?![\w.\-])')
+        return cls('|'.join(alternatives), placeholders)
+
+    def template(self, url):
+        if self.pattern is None:
+            return url
+        return self.pattern.sub(lambda match: f'${{{self.placeholders[match.group()]}}}', url)
+
+
+def mapping_digest(domain_mapping, specific_url_mapping):
+    data = json.dumps([domain_mapping, specific_url_mapping or {}], sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def load_url_templater(config_file, domain_mapping, specific_url_mapping=None):
+    """
+    Templater for these mappings: from memory, from the cache file next to
+    config_file when it was built for the same mappings, or built and cached.
+    """
+    digest = mapping_digest(domain_mapping, specific_url_mapping)
+    templater = _templaters.get(digest)
+    if templater is not None:
+        return templater
+
+    cache_path = config_file + CACHE_SUFFIX
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as cache_file:
+                cached = json.load(cache_file)
+            if cached.get('digest') == digest:
+                templater = UrlTemplater(cached['pattern'], cached['placeholders'])
+        except (ValueError, KeyError, re.error):
+            templater = None
+
+    if templater is None:
+        templater = UrlTemplater.build(domain_mapping, specific_url_mapping)
+        with open(cache_path, 'w', encoding='utf-8') as cache_file:
+            json.dump({'digest': digest, 'pattern': templater.pattern_source, 'placeholders': templater.placeholders}, cache_file)
+    _templaters[digest] = templater
+    return templater